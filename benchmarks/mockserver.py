@@ -0,0 +1,340 @@
+#!/usr/bin/python3
+
+# Synthetic Gitlab API for the benchmarks: thousands of projects, users & groups generated on the fly from their IDs,
+# with Gitlab's pagination headers (offset & keyset), ETags, and configurable latency & 429 injection.
+# Writes are answered as Gitlab would, but nothing is stored. Usage: python3 benchmarks/mockserver.py [--port 8765] [--projects 100000]
+
+import argparse,hashlib,json,random,re,threading,time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+
+total_headers_limit = 10000 # Gitlab stops counting above this, leaving out X-Total & X-Total-Pages
+visibilities = ('private', 'internal', 'public')
+simple_project_keys = ('id', 'description', 'name', 'name_with_namespace', 'path', 'path_with_namespace', 'created_at', 'default_branch',
+                       'tag_list', 'topics', 'ssh_url_to_repo', 'http_url_to_repo', 'web_url', 'readme_url', 'forks_count', 'avatar_url',
+                       'star_count', 'last_activity_at', 'namespace')
+
+
+class Instance: # The synthetic Gitlab: every element is derived from its ID, so 100k projects cost no memory
+    def __init__(self, projects=10000, users=10000, groups=100, branches=20):
+        self.projects = projects
+        self.users = users
+        self.groups = groups
+        self.branches = branches
+
+    def groupElement(self, group_id):
+        return {'id': group_id, 'name': 'group-%d' % group_id, 'path': 'group-%d' % group_id, 'full_path': 'group-%d' % group_id,
+                'full_name': 'group-%d' % group_id, 'description': 'Synthetic group %d' % group_id, 'visibility': visibilities[group_id % 3],
+                'lfs_enabled': True, 'request_access_enabled': False, 'parent_id': None, 'created_at': '2020-01-01T00:00:00.000Z',
+                'web_url': 'http://gitlab.example.com/groups/group-%d' % group_id, 'avatar_url': None}
+
+    def userElement(self, user_id):
+        return {'id': user_id, 'username': 'user-%d' % user_id, 'name': 'User %d' % user_id, 'state': 'blocked' if user_id % 97 == 0 else 'active',
+                'email': 'user-%d@example.com' % user_id, 'projects_limit': 100, 'can_create_group': True, 'external': False,
+                'is_admin': user_id == 1, 'created_at': '2020-01-01T00:00:00.000Z', 'avatar_url': None,
+                'web_url': 'http://gitlab.example.com/user-%d' % user_id}
+
+    def projectGroup(self, project_id):
+        return (project_id - 1) % self.groups + 1
+
+    def projectElement(self, project_id, simple=False):
+        group_id = self.projectGroup(project_id)
+        path = 'group-%d/project-%d' % (group_id, project_id)
+        project = {'id': project_id, 'name': 'project-%d' % project_id, 'path': 'project-%d' % project_id, 'path_with_namespace': path,
+                   'name_with_namespace': 'group-%d / project-%d' % (group_id, project_id), 'description': 'Synthetic project %d' % project_id,
+                   'created_at': '2020-01-01T00:00:00.000Z', 'last_activity_at': '2026-%02d-01T00:00:00.000Z' % (project_id % 12 + 1),
+                   'default_branch': 'main', 'tag_list': [], 'topics': [], 'forks_count': 0, 'star_count': project_id % 7, 'avatar_url': None,
+                   'ssh_url_to_repo': 'git@gitlab.example.com:%s.git' % path, 'http_url_to_repo': 'http://gitlab.example.com/%s.git' % path,
+                   'web_url': 'http://gitlab.example.com/' + path, 'readme_url': 'http://gitlab.example.com/%s/-/blob/main/README.md' % path,
+                   'namespace': {'id': group_id, 'name': 'group-%d' % group_id, 'path': 'group-%d' % group_id, 'kind': 'group', 'full_path': 'group-%d' % group_id}}
+        if simple:
+            return {key: project[key] for key in simple_project_keys}
+
+        project.update({'visibility': visibilities[project_id % 3], 'archived': project_id % 50 == 0, 'lfs_enabled': True,
+                        'issues_enabled': True, 'merge_requests_enabled': True, 'wiki_enabled': True, 'jobs_enabled': True, 'snippets_enabled': True,
+                        'container_registry_enabled': True, 'shared_runners_enabled': True, 'public_jobs': True, 'request_access_enabled': False,
+                        'open_issues_count': project_id % 13, 'empty_repo': False, 'creator_id': 1,
+                        '_links': {name: 'http://gitlab.example.com/api/v4/projects/%d/%s' % (project_id, name) for name in ('issues', 'merge_requests', 'repo_branches', 'labels', 'events', 'members')}})
+        return project
+
+    def branchElement(self, project_id, name):
+        return {'name': name, 'merged': False, 'protected': name == 'main', 'default': name == 'main', 'developers_can_push': False,
+                'developers_can_merge': False, 'can_push': True, 'web_url': 'http://gitlab.example.com/projects/%d/-/tree/%s' % (project_id, name),
+                'commit': {'id': hashlib.sha1(('%d/%s' % (project_id, name)).encode()).hexdigest(), 'title': 'Synthetic commit',
+                           'author_name': 'User 1', 'created_at': '2026-01-01T00:00:00.000Z'}}
+
+    def branchNames(self):
+        return ['main'] + ['feature-%d' % number for number in range(1, self.branches)]
+
+    def findProject(self, key): # Projects are found by ID or by their URL-encoded path
+        key = unquote(key)
+        match = re.fullmatch(r'(\d+)|group-(\d+)/project-(\d+)', key)
+        if not match:
+            return None
+        project_id = int(match.group(1) or match.group(3))
+        if not 1 <= project_id <= self.projects or (match.group(2) and int(match.group(2)) != self.projectGroup(project_id)):
+            return None
+        return project_id
+
+    def findGroup(self, key):
+        match = re.fullmatch(r'(\d+)|group-(\d+)', unquote(key))
+        group_id = int(match.group(1) or match.group(2)) if match else 0
+        return group_id if 1 <= group_id <= self.groups else None
+
+
+class Statistics: # Counters read by the benchmark runner, or through GET /__stats
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = {'requests': 0, 'throttled': 0, 'not_modified': 0, 'bytes': 0, 'GET': 0, 'POST': 0, 'PUT': 0, 'DELETE': 0}
+
+    def count(self, **amounts):
+        with self.lock:
+            for key, amount in amounts.items():
+                self.counters[key] = self.counters.get(key, 0) + amount
+
+    def read(self):
+        with self.lock:
+            return dict(self.counters)
+
+
+class GitlabHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # Keep-alive, like Gitlab behind its reverse proxy
+
+    def log_message(self, *args):
+        pass
+
+    def sendJson(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        headers = dict(headers or {})
+        if status == 200 and self.command == 'GET':
+            headers['ETag'] = 'W/"' + hashlib.md5(data).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == headers['ETag']:
+                status, data = 304, b''
+                self.server.statistics.count(not_modified=1)
+
+        self.send_response(status)
+        if data:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.statistics.count(bytes=len(data))
+
+    def sendPage(self, total, element, query, matches=None): # Offset or keyset page of the elements with IDs 1..total
+        per_page = min(100, int(query.get('per_page', ['20'])[0]))
+        matching = range(1, total + 1) if matches is None else [element_id for element_id in range(1, total + 1) if matches(element_id)]
+        path = urlparse(self.path).path
+        headers = {}
+
+        if query.get('pagination', [''])[0] == 'keyset':
+            after = int(query.get('id_after', ['0'])[0])
+            page = [element_id for element_id in matching if element_id > after][:per_page] if matches else list(range(after + 1, min(total, after + per_page) + 1))
+            if page and page[-1] < matching[-1]:
+                next_query = dict((key, values[0]) for key, values in query.items())
+                next_query['id_after'] = str(page[-1])
+                headers['Link'] = '<http://%s%s?%s>; rel="next"' % (self.headers['Host'], path, '&'.join(key + '=' + value for key, value in next_query.items()))
+            return self.sendJson(200, [element(element_id) for element_id in page], headers)
+
+        page_number = int(query.get('page', ['1'])[0])
+        pages = max(1, -(-len(matching) // per_page))
+        page = matching[(page_number - 1) * per_page:page_number * per_page]
+        headers.update({'X-Page': str(page_number), 'X-Per-Page': str(per_page), 'X-Prev-Page': str(page_number - 1) if page_number > 1 else ''})
+        if len(matching) <= total_headers_limit:
+            headers.update({'X-Total': str(len(matching)), 'X-Total-Pages': str(pages)})
+        if page_number < pages:
+            headers['X-Next-Page'] = str(page_number + 1)
+            headers['Link'] = '<http://%s%s?page=%d&per_page=%d>; rel="next"' % (self.headers['Host'], path, page_number + 1, per_page)
+        else:
+            headers['X-Next-Page'] = ''
+        self.sendJson(200, [element(element_id) for element_id in page], headers)
+
+    def beginRequest(self): # Latency & throttling common to every request, returns False when answered with a 429
+        settings = self.server.settings
+        self.server.statistics.count(requests=1, **{self.command: 1})
+        if settings['latency'] or settings['jitter']:
+            time.sleep(settings['latency'] + random.uniform(0, settings['jitter']))
+
+        if settings['throttle_rate'] and random.random() < settings['throttle_rate']:
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            self.server.statistics.count(throttled=1)
+            self.sendJson(429, {'message': '429 Too Many Requests'}, {'Retry-After': str(settings['retry_after']), 'RateLimit-Remaining': '0'})
+            return False
+        return True
+
+    def readBody(self):
+        data = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if not data:
+            return {}
+        elif 'json' in (self.headers.get('Content-Type') or ''):
+            return json.loads(data)
+        else: # Form encoded
+            return {key: values[0] for key, values in parse_qs(data.decode()).items()}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        path = url.path[len('/api/v4'):] if url.path.startswith('/api/v4') else url.path
+        instance = self.server.instance
+
+        if path == '/__stats': # Not counted, the runner reads it between commands
+            return self.sendJson(200, self.server.statistics.read())
+        if not self.beginRequest():
+            return
+
+        if path == '/user':
+            return self.sendJson(200, instance.userElement(1))
+        elif path == '/projects':
+            search = query.get('search', [''])[0]
+            visibility = query.get('visibility', [''])[0]
+            archived = query.get('archived', [''])[0]
+            simple = query.get('simple', [''])[0].lower() == 'true'
+            matches = None
+            if search or visibility or archived:
+                matches = lambda project_id: ((not search or search in 'project-%d' % project_id)
+                                              and (not visibility or visibilities[project_id % 3] == visibility)
+                                              and (not archived or (project_id % 50 == 0) == (archived.lower() == 'true')))
+            return self.sendPage(instance.projects, lambda project_id: instance.projectElement(project_id, simple), query, matches)
+        elif path == '/users':
+            username = query.get('username', [''])[0]
+            search = query.get('search', [''])[0]
+            matches = None
+            if username:
+                user_id = int(username[5:]) if re.fullmatch(r'user-\d+', username) else 0
+                matches = lambda candidate: candidate == user_id
+            elif search:
+                matches = lambda candidate: search in 'user-%d' % candidate
+            return self.sendPage(instance.users, instance.userElement, query, matches)
+        elif path == '/groups':
+            search = query.get('search', [''])[0]
+            return self.sendPage(instance.groups, instance.groupElement, query, (lambda group_id: search in 'group-%d' % group_id) if search else None)
+
+        match = re.fullmatch(r'/users/(\d+)', path)
+        if match and 1 <= int(match.group(1)) <= instance.users:
+            return self.sendJson(200, instance.userElement(int(match.group(1))))
+
+        match = re.fullmatch(r'/groups/([^/]+)(/projects|/members)?', path)
+        if match:
+            group_id = instance.findGroup(match.group(1))
+            if group_id is None:
+                return self.sendJson(404, {'message': '404 Group Not Found'})
+            elif match.group(2) == '/projects':
+                group_projects = -(-(instance.projects - group_id + 1) // instance.groups) # Projects are spread round-robin over the groups
+                return self.sendPage(group_projects, lambda number: instance.projectElement(group_id + (number - 1) * instance.groups), query)
+            elif match.group(2) == '/members':
+                return self.sendPage(min(instance.users, 10), lambda user_id: dict(instance.userElement(user_id), access_level=30), query)
+            return self.sendJson(200, instance.groupElement(group_id))
+
+        match = re.fullmatch(r'/projects/([^/]+)(?:/(repository/branches|repository/tags|protected_branches|members)(?:/(.+))?)?', path)
+        if match:
+            project_id = instance.findProject(match.group(1))
+            if project_id is None:
+                return self.sendJson(404, {'message': '404 Project Not Found'})
+            resource, name = match.group(2), unquote(match.group(3) or '')
+            names = instance.branchNames()
+            if resource is None:
+                return self.sendJson(200, instance.projectElement(project_id))
+            elif resource == 'repository/branches':
+                if name:
+                    return self.sendJson(200, instance.branchElement(project_id, name)) if name in names else self.sendJson(404, {'message': '404 Branch Not Found'})
+                search = query.get('search', [''])[0]
+                selected = [branch for branch in names if search in branch]
+                return self.sendPage(len(selected), lambda number: instance.branchElement(project_id, selected[number - 1]), query)
+            elif resource == 'repository/tags':
+                return self.sendPage(3, lambda number: {'name': 'v1.%d' % number, 'message': '', 'commit': instance.branchElement(project_id, 'main')['commit']}, query)
+            elif resource == 'protected_branches':
+                return self.sendPage(1, lambda number: {'id': 1, 'name': 'main', 'push_access_levels': [{'access_level': 40}], 'merge_access_levels': [{'access_level': 40}]}, query)
+            else:
+                return self.sendPage(min(instance.users, 10), lambda user_id: dict(instance.userElement(user_id), access_level=30), query)
+
+        self.sendJson(404, {'message': '404 Not Found'})
+
+    def do_POST(self):
+        if not self.beginRequest():
+            return
+        path = urlparse(self.path).path[len('/api/v4'):]
+        body = self.readBody()
+        instance = self.server.instance
+
+        match = re.fullmatch(r'/projects/([^/]+)/(repository/branches|repository/tags|repository/files/.+|protected_branches|members|archive|unarchive)', path)
+        if match:
+            project_id = instance.findProject(match.group(1))
+            if project_id is None:
+                return self.sendJson(404, {'message': '404 Project Not Found'})
+            elif match.group(2) == 'repository/branches':
+                return self.sendJson(201, instance.branchElement(project_id, body.get('branch', 'new')))
+            elif match.group(2) == 'repository/tags':
+                return self.sendJson(201, {'name': body.get('tag_name', 'new'), 'message': body.get('message', ''), 'commit': instance.branchElement(project_id, 'main')['commit']})
+            elif match.group(2) in ('archive', 'unarchive'):
+                return self.sendJson(201, dict(instance.projectElement(project_id), archived=match.group(2) == 'archive'))
+            return self.sendJson(201, dict(body, id=1))
+        elif path in ('/projects', '/groups', '/users'): # New elements get the next free ID
+            element = {'/projects': instance.projectElement, '/groups': instance.groupElement, '/users': instance.userElement}[path]
+            total = {'/projects': instance.projects, '/groups': instance.groups, '/users': instance.users}[path]
+            return self.sendJson(201, dict(element(total + 1), **body))
+        self.sendJson(201, dict(body, id=1))
+
+    def do_PUT(self):
+        if not self.beginRequest():
+            return
+        path = urlparse(self.path).path[len('/api/v4'):]
+        body = self.readBody()
+        instance = self.server.instance
+
+        match = re.fullmatch(r'/(projects|groups|users)/([^/]+)', path)
+        if match:
+            kind, key = match.groups()
+            element_id = instance.findProject(key) if kind == 'projects' else instance.findGroup(key) if kind == 'groups' else int(key) if key.isdigit() else None
+            if element_id is None:
+                return self.sendJson(404, {'message': '404 Not Found'})
+            element = {'projects': instance.projectElement, 'groups': instance.groupElement, 'users': instance.userElement}[kind]
+            return self.sendJson(200, dict(element(element_id), **body))
+        self.sendJson(200, body)
+
+    def do_DELETE(self):
+        if not self.beginRequest():
+            return
+        self.send_response(204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+def startServer(instance, port=0, latency_ms=0, jitter_ms=0, throttle_rate=0.0, retry_after=1): # Serves in a background thread, returns the server
+    server = ThreadingHTTPServer(('127.0.0.1', port), GitlabHandler)
+    server.daemon_threads = True
+    server.instance = instance
+    server.statistics = Statistics()
+    server.settings = {'latency': latency_ms / 1000, 'jitter': jitter_ms / 1000, 'throttle_rate': throttle_rate, 'retry_after': retry_after}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def addInstanceArguments(parser): # Shared with the benchmark runner
+    parser.add_argument('--projects', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--branches', type=int, default=20, help="Branches per project")
+    parser.add_argument('--latency-ms', type=float, default=0, help="Added to every answer")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="Random extra latency, up to this")
+    parser.add_argument('--throttle-rate', type=float, default=0, help="Share of the requests answered with a 429, i.e. 0.01")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with the 429 answers")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Synthetic Gitlab API for the benchmarks')
+    parser.add_argument('--port', type=int, default=8765)
+    addInstanceArguments(parser)
+    args = parser.parse_args()
+
+    server = startServer(Instance(args.projects, args.users, args.groups, args.branches), args.port, args.latency_ms, args.jitter_ms, args.throttle_rate, args.retry_after)
+    print('Serving a synthetic Gitlab with %d projects, %d users & %d groups on http://127.0.0.1:%d' % (args.projects, args.users, args.groups, server.server_address[1]))
+    print('Try: GLABCTL_URL=http://127.0.0.1:%d GLABCTL_TOKEN=benchmark GLABCTL_NO_CACHE=1 glabctl get projects' % server.server_address[1])
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
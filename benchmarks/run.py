@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+
+# Benchmark suite: runs the real glabctl commands against a synthetic Gitlab (benchmarks/mockserver.py) and reports,
+# for each scenario, the median wall time, the requests sent, the peak RSS and the throughput.
+# Usage: python3 benchmarks/run.py [--projects 100000] [--latency-ms 20] [--scenario get-projects] [--save results.json] [--baseline results.json]
+
+import argparse,json,os,shlex,subprocess,statistics,sys,tempfile,time
+
+import mockserver
+from startup import entryCommand, root_directory
+
+write_projects = 200 # Projects targeted by the bulk create & delete scenarios
+
+scenarios = { # Name: glabctl arguments, {projects} being a file listing the projects written to
+    'get-projects': 'get projects',
+    'get-projects-ndjson': 'get projects -o ndjson',
+    'get-projects-parallel': 'get projects -o ndjson --order-by id --parallel 8',
+    'get-projects-search': 'get projects --search project-1 -o csv --fields id,path_with_namespace',
+    'get-users': 'get users -o ndjson',
+    'get-groups': 'get groups -o ndjson',
+    'get-group-projects': 'get projects -g group-1 -o json',
+    'get-branches': 'get branches group-1/project-1 -o ndjson',
+    'get-project': 'get project -p group-1/project-1 id',
+    'create-branches': 'create branch benchmark --projects-from {projects} --parallel 16',
+    'update-project': 'update project group-1/project-1 --description benchmark --yes',
+    'delete-branches': 'delete branch benchmark --projects-from {projects} --parallel 16 --yes',
+}
+
+
+def runScenario(command, environment): # Wall time, peak RSS (MB) & output lines of one run
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=root_directory, env=environment, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output_lines = 0
+    for line in process.stdout:
+        output_lines += 1
+    error_output = process.stderr.read()
+    pid, status, usage = os.wait4(process.pid, 0) # Resources of this child alone, unlike RUSAGE_CHILDREN
+    wall_time = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    if process.returncode != 0:
+        raise SystemExit('FAILED: ' + ' '.join(command) + ' exited with status ' + str(process.returncode) + '\n' + error_output.decode(errors='replace')[-2000:])
+    peak_rss = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return wall_time, peak_rss, output_lines
+
+
+def benchmarkScenario(server, command, environment, runs): # Median of every run, the requests being counted by the synthetic Gitlab
+    results = []
+    for run in range(runs):
+        server.statistics.reset()
+        wall_time, peak_rss, output_lines = runScenario(command, environment)
+        results.append((wall_time, peak_rss, output_lines, server.statistics.read()))
+
+    wall_time = statistics.median(result[0] for result in results)
+    counters = results[-1][3]
+    return {'wall_seconds': round(wall_time, 4),
+            'requests': counters['requests'],
+            'throttled': counters['throttled'],
+            'megabytes_received': round(counters['bytes'] / (1024 * 1024), 2),
+            'peak_rss_mb': round(max(result[1] for result in results), 1),
+            'output_lines': results[-1][2],
+            'requests_per_second': round(counters['requests'] / wall_time, 1),
+            'lines_per_second': round(results[-1][2] / wall_time, 1)}
+
+
+def compareBaseline(results, baseline_file, tolerance): # Scenarios whose median wall time grew more than tolerance percent
+    with open(baseline_file) as baseline:
+        baseline_results = json.load(baseline)['results']
+    regressions = []
+    for name, result in results.items():
+        if name in baseline_results:
+            change = (result['wall_seconds'] / baseline_results[name]['wall_seconds'] - 1) * 100
+            print('%-24s %+7.1f%% wall time vs baseline%s' % (name, change, '  <-- REGRESSION' if change > tolerance else ''))
+            if change > tolerance:
+                regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark glabctl commands against a synthetic Gitlab')
+    mockserver.addInstanceArguments(parser)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--scenario', action='append', choices=list(scenarios), help="Only run this scenario (can be repeated)")
+    parser.add_argument('--entry', default='main.py', help="How to start glabctl, i.e. 'build/glabctl.pyz'")
+    parser.add_argument('--cache', action='store_true', help="Keep the response cache enabled (it starts empty, later runs revalidate it)")
+    parser.add_argument('--save', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Results saved by a previous run, to compare the wall times with")
+    parser.add_argument('--tolerance', type=float, default=10.0, help="Percent of extra wall time over the baseline reported as a regression")
+    args = parser.parse_args()
+
+    instance = mockserver.Instance(args.projects, args.users, args.groups, args.branches)
+    server = mockserver.startServer(instance, 0, args.latency_ms, args.jitter_ms, args.throttle_rate, args.retry_after)
+    working_directory = tempfile.mkdtemp(prefix='glabctl-benchmark-')
+    projects_file = os.path.join(working_directory, 'projects.txt')
+    with open(projects_file, 'w') as projects:
+        projects.write(''.join(instance.projectElement(project_id)['path_with_namespace'] + '\n' for project_id in range(1, min(write_projects, args.projects) + 1)))
+
+    environment = dict(os.environ, GLABCTL_URL='http://127.0.0.1:%d' % server.server_address[1], GLABCTL_TOKEN='benchmark',
+                       GLABCTL_NO_DAEMON='1', XDG_CACHE_HOME=working_directory) # The index, snapshot & cache of the user are left alone
+    if not args.cache:
+        environment['GLABCTL_NO_CACHE'] = '1'
+
+    print('Synthetic Gitlab: %d projects, %d users, %d groups, %d branches per project, %.0fms latency, %.1f%% throttled'
+          % (args.projects, args.users, args.groups, args.branches, args.latency_ms, args.throttle_rate * 100))
+    print('%-24s %9s %9s %9s %9s %10s %11s' % ('scenario', 'wall s', 'requests', '429s', 'MB recv', 'peak RSS', 'lines/s'))
+    results = {}
+    for name in args.scenario or scenarios:
+        command = entryCommand(args.entry) + shlex.split(scenarios[name].format(projects=projects_file))
+        results[name] = benchmarkScenario(server, command, environment, args.runs)
+        result = results[name]
+        print('%-24s %9.3f %9d %9d %9.2f %8.1fMB %11.1f' % (name, result['wall_seconds'], result['requests'], result['throttled'],
+                                                            result['megabytes_received'], result['peak_rss_mb'], result['lines_per_second']))
+    server.shutdown()
+
+    if args.save:
+        with open(args.save, 'w') as save:
+            json.dump({'instance': {key: value for key, value in vars(args).items() if key not in ('save', 'baseline', 'scenario')},
+                       'python': sys.version.split()[0], 'results': results}, save, indent=2)
+            save.write('\n')
+
+    if args.baseline and compareBaseline(results, args.baseline, args.tolerance):
+        print('FAILED: some scenarios are slower than the baseline')
+        sys.exit(1)
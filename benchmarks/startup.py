@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+
+# Startup budget guard: 'glabctl --help' must stay fast and must not import python-gitlab, requests or aiohttp.
+# With --command, it also measures the time until a real command (talking to GLABCTL_URL) prints its first byte.
+# Usage: python3 benchmarks/startup.py [--runs N] [--budget-ms MS] [--entry 'build/glabctl.pyz'] [--command 'get project -p group/project id']
+
+import argparse,os,shlex,subprocess,statistics,sys,time
+
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+heavy_modules = ['gitlab', 'requests', 'aiohttp']
+
+
+def measureCommand(command, runs): # Wall time in milliseconds of every run of a command
+    timings = []
+    for run in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=root_directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def measureFirstByte(command, runs): # Milliseconds until the command writes its first byte to stdout
+    timings = []
+    for run in range(runs):
+        started = time.perf_counter()
+        process = subprocess.Popen(command, cwd=root_directory, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        first_byte = process.stdout.read(1)
+        timings.append((time.perf_counter() - started) * 1000)
+        process.communicate()
+        if not first_byte or process.returncode != 0:
+            raise SystemExit('FAILED: ' + ' '.join(command) + ' exited with status ' + str(process.returncode))
+    return timings
+
+
+def entryCommand(entry): # How glabctl is started: main.py by default, a .pyz zipapp or any wrapper such as docker/bin/glabctl
+    command = shlex.split(entry)
+    if command[0].endswith(('.py', '.pyz')):
+        command.insert(0, sys.executable)
+    return command
+
+
+def findEagerImports(): # Heavy modules loaded just by building the CLI and printing its help
+    check = ('import sys, main\n'
+             'try:\n'
+             '    main.main(["--help"], standalone_mode=False)\n'
+             'except SystemExit:\n'
+             '    pass\n'
+             'print("EAGER:" + ",".join(m for m in ' + repr(heavy_modules) + ' if m in sys.modules))')
+    result = subprocess.run([sys.executable, '-c', check], cwd=root_directory, capture_output=True, text=True, check=True)
+    return [module for module in result.stdout.split('EAGER:')[-1].strip().split(',') if module]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Guard the startup time of glabctl')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=250.0)
+    parser.add_argument('--entry', default='main.py', help="How to start glabctl, i.e. 'build/glabctl.pyz' or 'docker/bin/glabctl'")
+    parser.add_argument('--command', help="A glabctl command whose time to first byte is measured, i.e. 'get project -p group/project id'")
+    parser.add_argument('--ttfb-budget-ms', type=float, help="Fail when the --command median time to first byte is over this budget")
+    args = parser.parse_args()
+
+    entry = entryCommand(args.entry)
+    baseline = measureCommand([sys.executable, '-c', 'pass'], args.runs)
+    help_timings = measureCommand(entry + ['--help'], args.runs)
+    eager_imports = findEagerImports()
+
+    print('python startup       median %7.1f ms' % statistics.median(baseline))
+    print('glabctl --help       median %7.1f ms  (min %.1f ms, budget %.0f ms)' % (statistics.median(help_timings), min(help_timings), args.budget_ms))
+    print('eager heavy imports  ' + (', '.join(eager_imports) or 'none'))
+    failed = eager_imports or statistics.median(help_timings) > args.budget_ms
+
+    if args.command:
+        first_byte_timings = measureFirstByte(entry + shlex.split(args.command), args.runs)
+        print('time to first byte   median %7.1f ms  (min %.1f ms%s)' % (statistics.median(first_byte_timings), min(first_byte_timings),
+                                                                     ', budget %.0f ms' % args.ttfb_budget_ms if args.ttfb_budget_ms else ''))
+        failed = failed or (args.ttfb_budget_ms and statistics.median(first_byte_timings) > args.ttfb_budget_ms)
+
+    if failed:
+        print('FAILED: the startup budget is exceeded')
+        sys.exit(1)
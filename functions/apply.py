@@ -0,0 +1,293 @@
+#!/usr/bin/python3
+
+import click,json
+from urllib.parse import quote
+from concurrent import futures
+from click_help_colors import HelpColorsCommand
+from . import common,commands
+from .update import addToChanges, changesPayload
+
+element_kinds = { # State file section: (key naming each element, keys applied through their own endpoint instead of the PUT)
+    'projects': ('project', ('archived',)),
+    'groups': ('group', ('parent_id',)),
+    'users': ('user', ('state',)),
+    'branches': ('branch', ()),
+}
+
+bulk_listing_threshold = 20 # Namespaces with more desired projects than this are read with one listing instead of a request per project
+default_access_level = 40
+
+
+def readStateFile(state_file): # The desired state, as a dictionary of element lists
+    content = state_file.read()
+
+    if state_file.name.endswith('.json') or content.lstrip().startswith('{'):
+        state = json.loads(content)
+    else:
+        try:
+            import yaml
+        except ImportError:
+            raise click.ClickException('YAML state files need PyYAML installed (pip3 install pyyaml)')
+        state = yaml.safe_load(content) or {}
+
+    if not isinstance(state, dict) or not set(state) <= set(element_kinds):
+        raise click.ClickException('The state file must be a mapping with any of these lists: ' + ', '.join(element_kinds))
+
+    for section, (identity_key, action_keys) in element_kinds.items():
+        for element in state.get(section) or []:
+            if not isinstance(element, dict) or identity_key not in element or (section == 'branches' and 'project' not in element):
+                raise click.ClickException('Every element in <' + section + '> needs its <' + identity_key + '> key: ' + str(element))
+
+    return state
+
+
+def listNamespaceProjects(gl, namespace): # Every project of a group, or of a user when the namespace is not a group
+    from gitlab.exceptions import GitlabHttpError
+
+    try:
+        return gl.http_list('/groups/' + quote(namespace, safe='') + '/projects', include_subgroups=True, per_page=100, get_all=True)
+    except GitlabHttpError as e:
+        if e.response_code != 404:
+            raise
+        return gl.http_list('/users/' + quote(namespace, safe='') + '/projects', per_page=100, get_all=True)
+
+
+def fetchCurrentState(gl, state, parallel): # Current state of every element named in the state file, read concurrently
+    lookups = {}
+    desired_projects = set(p['project'] for p in state.get('projects') or [])
+    desired_projects.update(b['project'] for b in state.get('branches') or [])
+
+    namespaces = {}
+    for project_path in desired_projects:
+        namespaces.setdefault(project_path.split('/')[0], []).append(project_path)
+    for namespace, project_paths in namespaces.items():
+        if len(project_paths) > bulk_listing_threshold:
+            lookups[('namespace', namespace)] = lambda n=namespace: listNamespaceProjects(gl, n)
+        else:
+            for project_path in project_paths:
+                lookups[('project', project_path)] = lambda p=project_path: gl.http_get('/projects/' + quote(p, safe=''))
+
+    for group in state.get('groups') or []:
+        lookups[('group', group['group'])] = lambda g=group['group']: gl.http_get('/groups/' + quote(g, safe=''))
+    for user in state.get('users') or []:
+        lookups[('user', user['user'])] = lambda u=user['user']: gl.http_list('/users', username=u)
+    for project_path in set(b['project'] for b in state.get('branches') or []):
+        lookups[('protected', project_path)] = lambda p=project_path: gl.http_list('/projects/' + quote(p, safe='') + '/protected_branches', per_page=100, get_all=True)
+
+    current = {}
+    failures = {}
+    with futures.ThreadPoolExecutor(max_workers=parallel) as executor:
+        running = {executor.submit(lookup): key for key, lookup in lookups.items()}
+        for finished in futures.as_completed(running):
+            kind, name = running[finished]
+            try:
+                result = finished.result()
+            except Exception as e:
+                failures[kind + ' ' + name] = str(e)
+                continue
+
+            if kind == 'namespace':
+                for project in result:
+                    current[('project', project['path_with_namespace'])] = project
+            elif kind == 'user':
+                if result:
+                    current[('user', name)] = result[0]
+            elif kind == 'protected':
+                current[('protected', name)] = {b['name']: b for b in result}
+            else:
+                current[(kind, name)] = result
+
+    return current, failures
+
+
+def diffElement(current_element, desired_element, identity_key): # The before/after of every key not already in the desired state
+    changes = {}
+    for key, value in desired_element.items():
+        if key == identity_key:
+            continue
+        elif key not in current_element:
+            raise KeyError(key)
+        elif current_element[key] != value:
+            changes = addToChanges(changes, key, current_element[key], value)
+    return changes
+
+
+def protectionLevel(protected_branch, key): # Highest access level allowed by a protected branch rule
+    levels = [level['access_level'] for level in protected_branch.get(key + 's') or [] if level.get('access_level') is not None]
+    return max(levels) if levels else None
+
+
+def hasSpecificLevels(protected_branch): # Levels granted to given users or groups, which the state file can't describe
+    return any(level.get('access_level') is None for key in ('push_access_levels', 'merge_access_levels') for level in protected_branch.get(key) or [])
+
+
+def diffBranch(protected_branches, desired_branch): # Branch protections as changes over the 'protected' & access level keys
+    changes = {}
+    protected_branch = protected_branches.get(desired_branch['branch'])
+    protected = desired_branch.get('protected', True)
+
+    if not protected:
+        if protected_branch:
+            changes = addToChanges(changes, 'protected', True, False)
+        return changes
+
+    if protected_branch is None:
+        changes = addToChanges(changes, 'protected', False, True)
+    for key in ('push_access_level', 'merge_access_level'):
+        desired_level = desired_branch.get(key, default_access_level)
+        current_level = protectionLevel(protected_branch, key) if protected_branch else None
+        if current_level != desired_level:
+            changes = addToChanges(changes, key, current_level, desired_level)
+
+    if changes and protected_branch and hasSpecificLevels(protected_branch): # Protecting it again would drop the users & groups allowed
+        raise ValueError('Left untouched, its protection allows specific users or groups, which a state file can not describe')
+    return changes
+
+
+def planWrites(gl, section, current_element, desired_element, changes): # The requests converging one element, run in order
+    identity_key, action_keys = element_kinds[section]
+    payload = changesPayload(changes, action_keys)
+    writes = []
+
+    if section == 'projects':
+        if payload:
+            writes.append(lambda: gl.projects.update(current_element['id'], payload))
+        if 'archived' in changes:
+            project = gl.projects.get(current_element['id'], lazy=True)
+            writes.append(project.archive if changes['archived']['after'] else project.unarchive)
+
+    elif section == 'groups':
+        if payload:
+            writes.append(lambda: gl.groups.update(current_element['id'], payload))
+        if 'parent_id' in changes:
+            writes.append(lambda: gl.groups.get(current_element['id'], lazy=True).transfer(changes['parent_id']['after']))
+
+    elif section == 'users':
+        if payload:
+            writes.append(lambda: gl.users.update(current_element['id'], payload))
+        if 'state' in changes:
+            user = gl.users.get(current_element['id'], lazy=True)
+            writes.append(user.block if changes['state']['after'] == 'blocked' else user.unblock)
+
+    else: # Gitlab changes a protection by removing it and protecting the branch again
+        protected_branches = gl.projects.get(desired_element['project'], lazy=True).protectedbranches
+        branch_name = desired_element['branch']
+        if changes.get('protected', {}).get('before') is not False:
+            writes.append(lambda: protected_branches.delete(branch_name))
+        if desired_element.get('protected', True):
+            writes.append(lambda: protected_branches.create({'name': branch_name,
+                                                             'push_access_level': desired_element.get('push_access_level', default_access_level),
+                                                             'merge_access_level': desired_element.get('merge_access_level', default_access_level)}))
+
+    return writes
+
+
+def displayElementChanges(label, changes):
+    common.clickOutputMessage('CHANGE', 'yellow', label)
+    for key, change in changes.items():
+        click.echo('   ' + click.style('>', fg='yellow') + ' ' + key + ': ' + click.style(str(change['before']), fg='red')
+                   + ' --> ' + click.style(str(change['after']), fg='yellow'))
+
+
+@click.command('apply', cls=HelpColorsCommand, help_headers_color='yellow', help_options_color='green', short_help=commands.shortHelp('apply'))
+@click.option('--file', '-f', 'state_file', type=click.File('r'), required=True, help="YAML or JSON file describing the desired state")
+@click.option('--dry-run', is_flag=True, help="Only show the changes, without applying them")
+@click.option('--parallel', type=click.IntRange(1, 32), default=8, help="Amount of requests sent concurrently")
+@click.option('--auto-confirm', '--yes', is_flag=True, help="Apply the changes without asking for confirmation")
+@click.option('--url', help="URL directing to Gitlab")
+@click.option('--token', help="Private token to access Gitlab")
+@click.pass_context
+def apply(ctx, state_file, dry_run, parallel, auto_confirm, url, token):
+    """Make Gitlab projects, groups, users & branch protections match a desired state.
+
+    \b
+    The state file lists the elements by kind, using the Gitlab API attribute names:
+        projects:
+          - project: group/project
+            description: Payments API
+            visibility: private
+            archived: false
+        groups:
+          - group: group
+            request_access_enabled: false
+        users:
+          - user: username
+            projects_limit: 20
+            state: active
+        branches:
+          - project: group/project
+            branch: main
+            protected: true
+            push_access_level: 40
+            merge_access_level: 40
+
+    Only the attributes which differ from the current state are sent, so
+    elements already in their desired state cost no write at all.
+    Branch protections allowing specific users or groups are skipped, as
+    recreating them from the state file would drop those.
+    """
+    state = readStateFile(state_file)
+    gl = common.performConnection(url, token)
+
+    common.clickOutputHeader('Applying', 'State', state_file.name)
+    common.clickOutputMessage('FETCHING', 'yellow', 'Reading the current state of every element...')
+    current, failures = fetchCurrentState(gl, state, parallel)
+
+    planned = []
+    unmanaged = {}
+    unchanged = 0
+    for section, (identity_key, action_keys) in element_kinds.items():
+        for desired_element in state.get(section) or []:
+            if section == 'branches':
+                label = 'branch ' + desired_element['project'] + ':' + desired_element['branch']
+                current_element = current.get(('protected', desired_element['project']))
+            else:
+                label = identity_key + ' ' + desired_element[identity_key]
+                current_element = current.get((identity_key, desired_element[identity_key]))
+
+            if current_element is None:
+                failures.setdefault(label, 'It does not exist or could not be read')
+                continue
+
+            try:
+                if section == 'branches':
+                    changes = diffBranch(current_element, desired_element)
+                else:
+                    changes = diffElement(current_element, desired_element, identity_key)
+            except KeyError as e:
+                failures[label] = 'Unknown attribute ' + str(e)
+                continue
+            except ValueError as e:
+                unmanaged[label] = str(e)
+                continue
+
+            if changes:
+                planned.append((label, changes, planWrites(gl, section, current_element, desired_element, changes)))
+            else:
+                unchanged += 1
+
+    print('--------------------------------------------------------------------------------------')
+    for label, changes, writes in planned:
+        displayElementChanges(label, changes)
+    for label, reason in unmanaged.items():
+        common.clickOutputMessage('SKIPPED', 'yellow', label + ': ' + reason)
+    for label, error in failures.items():
+        common.clickOutputMessage('FAILED', 'red', label + ': ' + error)
+
+    print('--------------------------------------------------------------------------------------')
+    common.clickOutputMessage('PLAN', 'yellow', str(len(planned)) + ' to change, ' + str(unchanged) + ' already in the desired state, '
+                              + (str(len(unmanaged)) + ' skipped, ' if unmanaged else '') + str(len(failures)) + ' failed')
+
+    if planned and not dry_run:
+        print('--------------------------------------------------------------------------------------')
+        if not common.askForConfirmation(auto_confirm, ' >>> Do you want to apply these changes? (yes/no): ', 'You decided not to apply the changes'):
+            return 1
+
+        def runWrites(planned_element):
+            for write in planned_element[2]:
+                write()
+
+        failures.update(common.runParallelOperations(planned, runWrites, parallel, label=lambda planned_element: planned_element[0]))
+
+    if failures:
+        ctx.exit(1)
@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+
+import click,json,time,asyncio
+from urllib.parse import quote
+from . import common
+
+try: # Optional asyncio HTTP client, only needed by the --async engine
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+max_retries = 5
+
+
+async def requestJson(session, semaphore, url, params): # One GET request, retried when Gitlab throttles us
+    for retry in range(max_retries + 1):
+        async with semaphore:
+            started = time.perf_counter()
+            async with session.get(url, params=params) as response:
+                body = await response.read()
+                if common.http_recording['enabled']:
+                    common.recordHttpRequest('GET', str(response.url), response.status, time.perf_counter() - started, len(body), response.headers)
+                if response.status == 429 and retry < max_retries:
+                    retry_after = response.headers.get('Retry-After', '')
+                    delay = int(retry_after) if retry_after.isdigit() else 2 ** retry
+                else:
+                    response.raise_for_status()
+                    return json.loads(body), response.headers
+
+        await asyncio.sleep(delay)
+
+
+async def requestAllPages(session, semaphore, url, params, page_size, on_page): # First page tells X-Total-Pages, then every other page is requested at once
+    params = dict(params, per_page=page_size, page=1)
+    items, headers = await requestJson(session, semaphore, url, params)
+    on_page(items)
+
+    if headers.get('X-Total-Pages'):
+        pending = [asyncio.ensure_future(requestJson(session, semaphore, url, dict(params, page=page))) for page in range(2, int(headers['X-Total-Pages']) + 1)]
+        try:
+            for next_page in asyncio.as_completed(pending):
+                items, headers = await next_page
+                on_page(items)
+        finally: # Cancelled or failed, the pages still requested are dropped too
+            for task in pending:
+                task.cancel()
+
+    else: # Gitlab omits the totals on huge collections, follow the pages one after another
+        while headers.get('X-Next-Page'):
+            items, headers = await requestJson(session, semaphore, url, dict(params, page=headers['X-Next-Page']))
+            on_page(items)
+
+
+async def fetchProjectsBranches(api_url, token, group, project_filters, branch_filters, page_size, concurrency, limit, emit): # Branch requests start as soon as their project's page arrives
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    branch_tasks = []
+    failures = {}
+    emitted = []
+
+    if group:
+        projects_url = api_url + '/groups/' + quote(group, safe='') + '/projects'
+    else:
+        projects_url = api_url + '/projects'
+
+    async with aiohttp.ClientSession(headers={'PRIVATE-TOKEN': token or ''}, connector=connector, raise_for_status=False) as session:
+        async def fetchBranches(project):
+            def emitBranches(branches):
+                for branch in branches:
+                    if limit and len(emitted) >= limit:
+                        return
+                    branch['project'] = project['path_with_namespace']
+                    emit(branch)
+                    emitted.append(None)
+                    if limit and len(emitted) >= limit: # Nothing left to output, every request still running is dropped
+                        for task in [projects_task] + branch_tasks:
+                            task.cancel()
+
+            try:
+                await requestAllPages(session, semaphore, api_url + '/projects/' + str(project['id']) + '/repository/branches', branch_filters, page_size, emitBranches)
+            except aiohttp.ClientError as e:
+                failures[project['path_with_namespace']] = str(e)
+
+        def scheduleBranches(projects):
+            for project in projects:
+                branch_tasks.append(asyncio.ensure_future(fetchBranches(project)))
+
+        projects_task = asyncio.ensure_future(requestAllPages(session, semaphore, projects_url, project_filters, page_size, scheduleBranches))
+        try:
+            await projects_task
+        except asyncio.CancelledError:
+            if not projects_task.cancelled():
+                raise
+        for result in await asyncio.gather(*branch_tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                raise result
+
+    return failures
+
+
+def listAllProjectsBranches(url, token, group, project_filters, branch_filters, page_size, concurrency, limit, emit): # Synchronous entry point for the 'get' subcommands
+    if aiohttp is None:
+        raise click.ClickException('The --async engine needs aiohttp installed (pip3 install aiohttp)')
+
+    api_url = common.defineGitlabHost(url).rstrip('/') + '/api/v4'
+    return asyncio.run(fetchProjectsBranches(api_url, common.defineGitlabToken(token), group, project_filters, branch_filters, page_size, concurrency, limit, emit))
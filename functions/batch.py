@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+
+import click,shlex,json,time
+from click_help_colors import HelpColorsCommand
+from . import common,commands
+
+
+def readBatchOperations(batch_file, batch_format): # Returns every operation as an argv list
+    content = batch_file.read()
+
+    if batch_format == 'auto':
+        stripped = content.lstrip()
+        if batch_file.name.endswith('.json') or stripped.startswith('['):
+            batch_format = 'json'
+        elif batch_file.name.endswith(('.yml', '.yaml')) or stripped.startswith('- '):
+            batch_format = 'yaml'
+        else:
+            batch_format = 'lines'
+
+    if batch_format == 'json':
+        operations = json.loads(content)
+    elif batch_format == 'yaml':
+        try:
+            import yaml
+        except ImportError:
+            raise click.ClickException('YAML batch files need PyYAML installed (pip3 install pyyaml)')
+        operations = yaml.safe_load(content) or []
+    else: # One command per line, blank lines and comments are skipped
+        operations = [line for line in content.splitlines() if line.strip() and not line.strip().startswith('#')]
+
+    if not isinstance(operations, list):
+        raise click.ClickException('The batch file must contain a list of operations')
+
+    argv_list = []
+    for operation in operations:
+        if isinstance(operation, str):
+            argv = shlex.split(operation, comments=True)
+        else:
+            argv = [str(argument) for argument in operation]
+
+        if argv and argv[0] == 'glabctl': # Allow copy-pasting full command lines
+            argv = argv[1:]
+        argv_list.append(argv)
+
+    return argv_list
+
+
+def runBatchOperation(root_command, argv): # Runs one operation in-process, returning (succeeded, message)
+    try:
+        result = root_command.main(args=argv, prog_name='glabctl', standalone_mode=False)
+    except click.ClickException as e: # Commands wrap the exception they caught, not always a string
+        if isinstance(e.message, EOFError):
+            return False, 'A confirmation was asked but there is no input, use --yes/--auto-confirm'
+        return False, str(e.format_message())
+    except click.exceptions.Abort:
+        return False, 'Aborted'
+    except EOFError:
+        return False, 'A confirmation was asked but there is no input, use --yes/--auto-confirm'
+    except Exception as e: # One failed operation never stops the others
+        return False, str(e)
+    finally:
+        common.outputReset()
+
+    if result not in (None, 0):
+        return False, 'Exited with status ' + str(result)
+    else:
+        return True, ''
+
+
+@click.command('batch', cls=HelpColorsCommand, help_headers_color='yellow', help_options_color='green', short_help=commands.shortHelp('batch'))
+@click.option('--format', 'batch_format', type=click.Choice(['auto', 'lines', 'json', 'yaml']), default='auto', help="How the batch file is written")
+@click.option('--stop-on-error', is_flag=True, help="Stop at the first failed operation")
+@click.argument('batch_file', type=click.File('r'), default='-')
+@click.pass_context
+def batch(ctx, batch_file, batch_format, stop_on_error):
+    """Run a list of glabctl operations sharing a single process and Gitlab connection.
+
+    \b
+    Operations are read from BATCH_FILE (or stdin with '-'), either one command per line:
+        create branch feature-x -p group/project
+        update project group/project --description 'New description' --yes
+    or as a JSON/YAML list of command strings or argument lists.
+
+    Remember to add --yes to the operations asking for confirmation!
+    """
+    root_command = ctx.find_root().command
+    operations = readBatchOperations(batch_file, batch_format)
+    failures = 0
+
+    for number, argv in enumerate(operations, 1):
+        elapsed = ''
+        if argv and argv[0] == 'batch':
+            succeeded, message = False, 'Nested batch operations are not allowed'
+        else:
+            started = time.monotonic()
+            succeeded, message = runBatchOperation(root_command, argv)
+            elapsed = ' (' + format(time.monotonic() - started, '.2f') + 's)'
+
+        command_string = ' '.join(shlex.quote(argument) for argument in argv)
+        if succeeded:
+            common.clickOutputMessage('OK', 'green', '#' + str(number) + ' ' + command_string + elapsed)
+        else:
+            failures += 1
+            common.clickOutputMessage('FAILED', 'red', '#' + str(number) + ' ' + command_string + ': ' + message)
+            if stop_on_error:
+                break
+
+    print('--------------------------------------------------------------------------------------')
+    common.clickOutputMessage('SUMMARY', 'yellow', str(len(operations)) + ' operations, ' + str(failures) + ' failed')
+
+    if failures:
+        ctx.exit(1)
@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+
+import os,re,json,time,shutil,hashlib,tempfile,atexit
+from urllib.parse import urlparse
+
+cache_directory = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'glabctl')
+cache_max_size = 64 * 1024 * 1024
+cache_settings = {'enabled': True, 'refresh': False, 'written': False}
+
+resource_ttls = [ # Seconds a response is served without asking Gitlab. Anything else is always revalidated through its ETag
+    (re.compile(r'/api/v4/user$'), 3600),
+    (re.compile(r'/api/v4/users/[^/]+$'), 300),
+    (re.compile(r'/api/v4/groups/[^/]+$'), 300),
+    (re.compile(r'/api/v4/projects/[^/]+$'), 120),
+    (re.compile(r'/api/v4/projects/[^/]+/repository/branches/.+$'), 30),
+]
+
+skipped_headers = ('content-encoding', 'content-length', 'transfer-encoding', 'connection', 'set-cookie', 'keep-alive')
+
+
+def configureCache(enabled, refresh):
+    cache_settings['enabled'] = enabled
+    cache_settings['refresh'] = refresh
+
+
+def isCacheable(request, kwargs):
+    return cache_settings['enabled'] and request.method == 'GET' and not kwargs.get('stream')
+
+
+def resourceTtl(url):
+    path = url.split('?')[0]
+    for pattern, ttl in resource_ttls:
+        if pattern.search(path):
+            return ttl
+    return 0
+
+
+def identityHash(url, token): # Names the files of a Gitlab host + token, the token itself is never written to disk
+    return hashlib.sha256((urlparse(url).netloc + '\n' + (token or '')).encode('utf-8')).hexdigest()[:32]
+
+
+def identityDirectory(request): # Entries are split by Gitlab host + token
+    token = request.headers.get('PRIVATE-TOKEN') or request.headers.get('Authorization') or ''
+    return os.path.join(cache_directory, identityHash(request.url, token))
+
+
+def entryPath(request):
+    return os.path.join(identityDirectory(request), hashlib.sha256(request.url.encode('utf-8')).hexdigest())
+
+
+def loadEntry(request): # Returns (metadata, body) or None, every entry is a JSON header line followed by the raw body
+    path = entryPath(request)
+    try:
+        with open(path, 'rb') as entry_file:
+            metadata = json.loads(entry_file.readline())
+            body = entry_file.read()
+    except (OSError, ValueError):
+        return None
+
+    if metadata.get('url') != request.url:
+        return None
+    return metadata, body
+
+
+def storeEntry(request, response, body):
+    metadata = {'url': request.url,
+                'stored_at': time.time(),
+                'ttl': resourceTtl(request.url),
+                'etag': response.headers.get('ETag'),
+                'headers': {k: v for k, v in response.headers.items() if k.lower() not in skipped_headers}}
+
+    if not metadata['etag'] and not metadata['ttl']: # Nothing to gain from keeping it
+        return
+
+    directory = identityDirectory(request)
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(file_descriptor, 'wb') as entry_file:
+            entry_file.write(json.dumps(metadata).encode('utf-8') + b'\n')
+            entry_file.write(body)
+        os.replace(temporary_path, entryPath(request))
+        cache_settings['written'] = True
+    except OSError: # The cache is an optimization, never a reason to fail
+        pass
+
+
+def refreshEntry(request, metadata, body): # A 304 proved the entry is still good, restart its TTL
+    metadata['stored_at'] = time.time()
+    path = entryPath(request)
+    try:
+        with open(path, 'wb') as entry_file:
+            entry_file.write(json.dumps(metadata).encode('utf-8') + b'\n')
+            entry_file.write(body)
+    except OSError:
+        pass
+
+
+def touchEntry(request): # Access time for the LRU eviction
+    try:
+        os.utime(entryPath(request))
+    except OSError:
+        pass
+
+
+def isFresh(metadata):
+    return not cache_settings['refresh'] and time.time() - metadata['stored_at'] < metadata['ttl']
+
+
+def buildResponse(request, metadata, body): # Rebuild a requests.Response from a cache entry
+    import requests
+
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = 'OK'
+    response._content = body
+    response.headers = requests.structures.CaseInsensitiveDict(metadata['headers'])
+    response.url = request.url
+    response.request = request
+    response.encoding = 'utf-8'
+    return response
+
+
+def invalidateIdentity(request): # Any write may change what was cached for this identity
+    shutil.rmtree(identityDirectory(request), ignore_errors=True)
+
+
+def evictEntries(): # Drop the least recently used entries until the cache fits its size budget
+    if not cache_settings['written']:
+        return
+
+    entries = []
+    total_size = 0
+    try:
+        for identity in os.scandir(cache_directory):
+            if identity.is_dir():
+                for entry in os.scandir(identity.path):
+                    entry_stat = entry.stat()
+                    entries.append((entry_stat.st_mtime, entry_stat.st_size, entry.path))
+                    total_size += entry_stat.st_size
+    except OSError:
+        return
+
+    for mtime, size, path in sorted(entries):
+        if total_size <= cache_max_size:
+            break
+        try:
+            os.remove(path)
+            total_size -= size
+        except OSError:
+            pass
+
+atexit.register(evictEntries)
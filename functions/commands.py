@@ -0,0 +1,20 @@
+#!/usr/bin/python3
+
+# Top-level commands: the module defining each one, and its short help. main.py lists them in 'glabctl --help'
+# without importing those modules, and every module reads its own short help from here, so both always match.
+subcommands = {
+    'get': ('functions.get', "Get any element listed in 'Commands' section."),
+    'create': ('functions.create', "Create any element listed in 'Commands' section."),
+    'delete': ('functions.delete', "Delete any element listed in 'Commands' section."),
+    'update': ('functions.update', "Update values from already existing objects on Gitlab."),
+    'batch': ('functions.batch', "Run many glabctl operations in one process"),
+    'apply': ('functions.apply', "Converge Gitlab to a desired state file"),
+    'members': ('functions.members', "Manage the members of groups & projects."),
+    'index': ('functions.index', "Manage the local index resolving names to Gitlab IDs."),
+    'snapshot': ('functions.snapshot', "Save an inventory of the whole Gitlab instance"),
+    'serve': ('functions.serve', "Keep glabctl warm in the background to answer commands faster"),
+}
+
+
+def shortHelp(cmd_name):
+    return subcommands[cmd_name][1]
@@ -1,7 +1,35 @@
 #!/usr/bin/python3
 
-import gitlab,click,os,json,collections
-from ast import literal_eval
+import click,os,sys,io,csv,json,time,random,atexit,threading,collections.abc
+from concurrent import futures
+
+try: # Optional faster JSON encoder
+    import orjson
+except ImportError:
+    orjson = None
+
+output_buffer = bytearray()
+output_buffer_size = 256 * 1024
+output_interactive = None
+output_styled = None
+output_table_columns = []
+
+gitlab_connections = {}
+connection_pool_size = 32
+
+rate_limit_state = {'remaining': None, 'reset': 0.0, 'pause_until': 0.0}
+rate_limit_lock = threading.Lock()
+rate_limit_reserve = 5
+
+http_statistics = {'requests': 0, 'cached': 0}
+http_statistics_lock = threading.Lock()
+http_recording = {'enabled': False, 'trace': False, 'started': 0.0}
+http_records = []
+http_latency_buckets = (10, 25, 50, 100, 250, 500, 1000, 2500) # Upper bounds in milliseconds, the last bucket has none
+pagination_headers = {'X-Page': 'page', 'X-Per-Page': 'per_page', 'X-Total': 'total', 'X-Total-Pages': 'total_pages', 'X-Next-Page': 'next_page'}
+current_usernames = {}
+user_ids = {}
+user_listing_threshold = 50
 
 def defineGitlabHost(url): # Simple checker for host
     if url:
@@ -17,30 +45,353 @@ def defineGitlabToken(token): # Simple checker for private token
         return os.environ.get('GLABCTL_TOKEN')
 
 
-def performConnection(url, token): # Gitlab connection function (url + private token)
+def recordRateLimit(response, *args, **kwargs): # Requests hook keeping track of Gitlab's RateLimit-* and Retry-After headers
+    headers = response.headers
+
+    with rate_limit_lock:
+        if 'RateLimit-Remaining' in headers:
+            try:
+                remaining, reset = int(headers['RateLimit-Remaining']), float(headers.get('RateLimit-Reset', 0))
+            except ValueError: # Rewritten by a proxy, not throttling on a quota which can't be read
+                remaining, reset = None, 0
+            rate_limit_state['remaining'] = remaining
+            rate_limit_state['reset'] = reset
+
+        if response.status_code == 429: # Every worker pauses, not only the one that got throttled
+            retry_after = headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                pause_until = time.time() + int(retry_after)
+            elif rate_limit_state['reset'] > time.time():
+                pause_until = rate_limit_state['reset']
+            else:
+                pause_until = time.time() + 1
+            rate_limit_state['pause_until'] = max(rate_limit_state['pause_until'], pause_until)
+
+
+def waitForRateLimit(): # Sleep while Gitlab asked us to, or while the request quota is about to run out
+    with rate_limit_lock:
+        pause_until = rate_limit_state['pause_until']
+        if rate_limit_state['remaining'] is not None and rate_limit_state['remaining'] <= rate_limit_reserve:
+            pause_until = max(pause_until, rate_limit_state['reset'])
+
+    delay = pause_until - time.time()
+    if delay > 0:
+        time.sleep(min(delay, 60))
+
+
+def runParallelOperations(items, operation, workers, label=str, max_retries=5): # Runs operation(item) on a bounded pool, returning {label: error} for the failed ones
+    from gitlab.exceptions import GitlabHttpError
+
+    def attemptOperation(item):
+        for retry in range(max_retries + 1):
+            waitForRateLimit()
+            try:
+                operation(item)
+                return None
+            except GitlabHttpError as e:
+                if e.response_code != 429 or retry == max_retries:
+                    return str(e)
+                time.sleep(min(60, 2 ** retry) + random.random()) # Exponential backoff with jitter on top of the shared pause
+            except Exception as e:
+                return str(e)
+
+    failures = {}
+    with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {executor.submit(attemptOperation, item): item for item in items}
+
+        for finished in futures.as_completed(running):
+            item_label = label(running[finished])
+            error = finished.result()
+            if error is None:
+                clickOutputMessage('OK', 'green', item_label)
+            else:
+                failures[item_label] = error
+                clickOutputMessage('FAILED', 'red', item_label + ': ' + error)
+
+    print('--------------------------------------------------------------------------------------')
+    clickOutputMessage('SUMMARY', 'yellow', str(len(items) - len(failures)) + ' succeeded, ' + str(len(failures)) + ' failed')
+    return failures
+
+
+def readProjectsFile(projects_file): # One <group>/<project_path> per line, blank lines and comments are skipped
+    projects = []
+    for line in projects_file:
+        line = line.split('#')[0].strip()
+        if line:
+            projects.append(line)
+    return projects
+
+
+def performConnection(url, token): # Gitlab connection function (url + private token), shared by every command in the process
     connection_host = defineGitlabHost(url)
     connection_token = defineGitlabToken(token)
-    return gitlab.Gitlab(connection_host, private_token=connection_token)
+    connection_key = (connection_host, connection_token)
+
+    if connection_key not in gitlab_connections: # python-gitlab & requests are only imported by commands talking to Gitlab
+        import gitlab
+        from . import session
+        gitlab_connections[connection_key] = gitlab.Gitlab(connection_host, private_token=connection_token, session=session.createSession())
+
+    return gitlab_connections[connection_key]
+
+
+def getTokenUsername(gl_object): # The current user is only asked once per connection
+    if id(gl_object) not in current_usernames:
+        gl_object.auth()
+        current_usernames[id(gl_object)] = gl_object.user.username
+    return current_usernames[id(gl_object)]
+
+
+def resolveUsernames(gl_object, usernames, workers=8): # Username -> ID for many users at once, through the local index first
+    from . import index
+
+    known_users = user_ids.setdefault(id(gl_object), {})
+    cached_users = index.cachedIds(gl_object, 'user', [username for username in set(usernames) if username not in known_users])
+    with futures.ThreadPoolExecutor(max_workers=workers) as executor: # Index entries are checked, a renamed user's name may belong to someone else now
+        for (username, user_id), verified in zip(cached_users.items(), executor.map(lambda item: index.verifyId(gl_object, 'user', *item), cached_users.items())):
+            if verified:
+                known_users[username] = user_id
+        stale_users = [username for username in cached_users if username not in known_users]
+    if stale_users:
+        index.forgetIds(gl_object, 'user', stale_users)
+    missing = {username.lower(): username for username in set(usernames) if username not in known_users} # Gitlab usernames are case insensitive
+
+    found_users = {}
+    if len(missing) > user_listing_threshold: # Reading every user once is cheaper than many lookups, but only on small instances
+        users = gl_object.http_list('/users', iterator=True, per_page=100) # Only its first page is read, telling the instance size
+        if users.total_pages and users.total_pages * workers <= len(missing): # Unknown past 10k users, then it is never small
+            for user in users:
+                if user['username'].lower() in missing:
+                    found_users[missing[user['username'].lower()]] = user['id']
+            missing = {}
+    if missing:
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for username, users in zip(missing.values(), executor.map(lambda username: gl_object.http_list('/users', username=username), missing.values())):
+                if users:
+                    found_users[username] = users[0]['id']
+
+    if found_users:
+        index.storeIds(gl_object, 'user', found_users)
+        known_users.update(found_users)
+    return {username: known_users[username] for username in usernames if username in known_users}
+
+
+def countHttpRequest(kind): # Called by the session for every request sent, or answered from the cache
+    with http_statistics_lock:
+        http_statistics[kind] += 1
+
+
+def printHttpStatistics(): # Written to stderr so the command output stays parseable
+    outputFlush()
+    click.echo(click.style('[HTTP]', fg='cyan') + ' ' + str(http_statistics['requests']) + ' requests sent to Gitlab, '
+               + str(http_statistics['cached']) + ' answered from the local cache', err=True)
+
+
+def resetHttpStatistics(): # Forget the counters & records, for commands run one after another in a process
+    with http_statistics_lock:
+        for kind in http_statistics:
+            http_statistics[kind] = 0
+        http_records.clear()
+    http_recording.update({'enabled': False, 'trace': False})
+
+
+def startHttpRecording(trace): # Keep a record of every request from now on, streaming them to stderr with trace
+    resetHttpStatistics()
+    http_recording.update({'enabled': True, 'trace': trace, 'started': time.monotonic()})
 
 
-def getTokenUsername(gl_object):
-    gl_object.auth()
-    return gl_object.user.username
+def recordHttpRequest(method, url, status, latency, received, headers, source='network', headers_latency=None): # Called by the connection layer once a response is complete
+    path = url.split('://', 1)[-1]
+    record = {'started': round(time.monotonic() - latency - http_recording['started'], 4),
+              'method': method,
+              'path': path[path.find('/'):] if '/' in path else '/',
+              'status': status,
+              'source': source, # network, cache (no request sent) or revalidated (304 answer)
+              'latency_ms': round(latency * 1000, 2),
+              'headers_ms': round(headers_latency * 1000, 2) if headers_latency is not None else None,
+              'bytes': received}
+    for header, key in pagination_headers.items():
+        if headers.get(header):
+            record[key] = int(headers[header]) if headers[header].isdigit() else headers[header]
 
-def transformToDict(transformation_string): # Transform python-gitlab's result to Python Dictionary
-    return literal_eval(str(transformation_string).split(' => ')[1])
+    with http_statistics_lock:
+        http_records.append(record)
+    if http_recording['trace']:
+        click.echo(formatHttpRecord(record), err=True)
 
-def transformToJson(dict_string): # Transform to JSON output
-    if isinstance(dict_string, collections.Mapping):
-        return json.dumps(dict_string)
+
+def formatHttpRecord(record): # One --trace line
+    line = click.style('[TRACE]', fg='cyan') + ' ' + record['method'] + ' ' + record['path'] + ' ' \
+        + click.style(str(record['status']), fg='green' if record['status'] < 400 else 'red') \
+        + ' ' + format(record['latency_ms'], '.1f') + 'ms ' + formatBytes(record['bytes'])
+    if 'page' in record:
+        line += ' page ' + str(record['page']) + ('/' + str(record['total_pages']) if 'total_pages' in record else '')
+    if record['source'] != 'network':
+        line += ' (' + record['source'] + ')'
+    return line
+
+
+def formatBytes(amount):
+    for unit in ('B', 'KB', 'MB'):
+        if amount < 1024 or unit == 'MB':
+            return (str(amount) if unit == 'B' else format(amount, '.1f')) + unit
+        amount /= 1024
+
+
+def summarizeHttpRecords(): # Totals, percentiles & latency histogram of the recorded requests
+    with http_statistics_lock:
+        records = list(http_records)
+    sent = [record for record in records if record['source'] != 'cache']
+    latencies = sorted(record['latency_ms'] for record in sent)
+
+    histogram = collections.OrderedDict((bound, 0) for bound in http_latency_buckets + (None,))
+    for latency in latencies:
+        histogram[next((bound for bound in http_latency_buckets if latency < bound), None)] += 1
+
+    statuses = collections.Counter(record['status'] for record in sent)
+    return {'wall_seconds': round(time.monotonic() - http_recording['started'], 3),
+            'requests': len(sent),
+            'cached': len(records) - len(sent),
+            'revalidated': sum(1 for record in sent if record['source'] == 'revalidated'),
+            'retried': statuses.get(429, 0), # Throttled answers, retried by python-gitlab or by the bulk operations
+            'errors': sum(amount for status, amount in statuses.items() if status >= 400 and status != 429),
+            'bytes': sum(record['bytes'] for record in sent),
+            'http_seconds': round(sum(latencies) / 1000, 3),
+            'methods': dict(collections.Counter(record['method'] for record in sent)),
+            'statuses': {str(status): amount for status, amount in sorted(statuses.items())},
+            'latency_ms': {name: latencies[min(len(latencies) - 1, int(len(latencies) * quantile))] if latencies else None
+                           for name, quantile in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1))},
+            'histogram': {('<' + str(bound) if bound else '>=' + str(http_latency_buckets[-1])) + 'ms': amount for bound, amount in histogram.items()}}
+
+
+def printHttpSummary(): # The --stats report, written to stderr
+    outputFlush()
+    summary = summarizeHttpRecords()
+    label = click.style('[STATS]', fg='cyan') + ' '
+
+    click.echo(label + str(summary['requests']) + ' requests (' + str(summary['revalidated']) + ' revalidated), ' + str(summary['cached']) + ' answered from the local cache, '
+               + formatBytes(summary['bytes']) + ' received, ' + str(summary['retried']) + ' retried after a 429, ' + str(summary['errors']) + ' errors', err=True)
+    click.echo(label + format(summary['http_seconds'], '.2f') + 's spent in requests over ' + format(summary['wall_seconds'], '.2f') + 's of wall time'
+               + ' (requests overlap when run in parallel)', err=True)
+    if not summary['requests']:
+        return
+
+    click.echo(label + ', '.join(method + ' ' + str(amount) for method, amount in summary['methods'].items()) + ' | '
+               + ', '.join(status + ' ' + str(amount) for status, amount in summary['statuses'].items()) + ' | '
+               + ', '.join(name + ' ' + format(latency, '.1f') + 'ms' for name, latency in summary['latency_ms'].items()), err=True)
+    buckets = list(summary['histogram'].items())
+    used = [position for position, (bucket, amount) in enumerate(buckets) if amount]
+    widest = max(summary['histogram'].values())
+    for bucket, amount in buckets[used[0]:used[-1] + 1]: # Empty buckets on both ends are not worth a line
+        click.echo('   ' + bucket.rjust(9) + ' ' + click.style('#' * (amount and max(1, round(40 * amount / widest))), fg='yellow') + ' ' + str(amount), err=True)
+
+
+def exportHttpRecords(export_file): # The --stats-json report, every request plus the summary
+    with http_statistics_lock:
+        records = list(http_records)
+    with open(export_file, 'w') as export:
+        json.dump({'command': sys.argv[1:], 'summary': summarizeHttpRecords(), 'requests': records}, export, indent=2)
+        export.write('\n')
+
+def transformToDict(gl_object, fields=None): # Transform python-gitlab's result to a Python dictionary of its own, never the object's storage
+    if isinstance(gl_object, collections.abc.Mapping):
+        attributes = gl_object
+    else: # A shallow copy, skipping the deep copies made by asdict()
+        attributes = gl_object.attributes
+
+    if fields: # Only keep the requested keys
+        return {field: attributes[field] for field in fields if field in attributes}
     else:
-        transformToJson(transformToDict(dict_string))
+        return dict(attributes)
 
-def prettyPrintJson(json_object, sort_flag):
-    parsed = json.loads(json_object)
-    formatted = json.dumps(parsed, indent=2, sort_keys=sort_flag)
-    
-    print(formatted)
+def transformToJson(dict_string, fields=None): # Transform to JSON output
+    return json.dumps(transformToDict(dict_string, fields))
+
+def parseFieldsOption(ctx, param, value): # Click callback turning 'id,name,...' into a list of fields
+    if value:
+        return [field.strip() for field in value.split(',') if field.strip()]
+    else:
+        return None
+
+def encodeJson(dict_object, pretty_print=False, sort_json=False): # Encode a dictionary to UTF-8 JSON bytes in a single pass
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS
+        if pretty_print:
+            options |= orjson.OPT_INDENT_2
+        if sort_json:
+            options |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(dict_object, default=str, option=options)
+
+    elif pretty_print:
+        return json.dumps(dict_object, indent=2, sort_keys=sort_json, ensure_ascii=False, default=str).encode('utf-8')
+    else:
+        return json.dumps(dict_object, separators=(',', ':'), sort_keys=sort_json, ensure_ascii=False, default=str).encode('utf-8')
+
+def prettyPrintJson(dict_object, sort_flag):
+    outputWrite(encodeJson(dict_object, True, sort_flag))
+
+def isOutputInteractive(): # Checked once, stdout won't turn into a terminal halfway through a command
+    global output_interactive
+    if output_interactive is None:
+        output_interactive = sys.stdout.isatty()
+    return output_interactive
+
+def isOutputStyled(): # Colors are only worth it for a human watching a terminal
+    if output_styled is not None:
+        return output_styled
+    else:
+        return isOutputInteractive()
+
+def setOutputStyling(styled):
+    global output_styled
+    output_styled = styled
+
+def outputWrite(line): # Queue a line for stdout, written out in big chunks unless stdout is interactive
+    if isinstance(line, str):
+        line = line.encode('utf-8')
+
+    output_buffer.extend(line)
+    output_buffer.extend(b'\n')
+
+    if len(output_buffer) >= output_buffer_size or isOutputInteractive():
+        outputFlush()
+
+def outputFlush(): # Write any queued line, keeping it ordered after regular print() output
+    if output_buffer:
+        sys.stdout.flush()
+        sys.stdout.buffer.write(output_buffer)
+        sys.stdout.buffer.flush()
+        output_buffer.clear()
+
+def outputReset(): # Flush and forget per-command output state, for commands run one after another in a process
+    global output_interactive, output_styled
+    outputFlush()
+    output_table_columns.clear()
+    output_interactive = None
+    output_styled = None
+
+def outputTableRow(dict_object, fields, delimiter): # CSV/TSV output, the header comes from --fields or from the first row
+    if not output_table_columns:
+        output_table_columns.extend(fields or dict_object.keys())
+        outputWrite(formatTableRow(output_table_columns, delimiter))
+
+    values = []
+    for column in output_table_columns:
+        value = dict_object.get(column)
+        if value is None:
+            value = ''
+        elif isinstance(value, (dict, list)): # Nested values are kept as compact JSON inside the cell
+            value = encodeJson(value).decode('utf-8')
+        values.append(value)
+
+    outputWrite(formatTableRow(values, delimiter))
+
+def formatTableRow(values, delimiter):
+    row = io.StringIO()
+    csv.writer(row, delimiter=delimiter, lineterminator='').writerow(values)
+    return row.getvalue()
+
+atexit.register(outputFlush)
 
 
 def validateProjectName(project_name):
@@ -63,6 +414,7 @@ def askForConfirmation(auto_confirm, confirmation_string, cancel_string, status=
         return True
 
 def clickOutputMessage(status, color, string):
+    outputFlush()
     click.echo('[' + click.style(status, fg=color) + '] ' + string)
 
 def clickOutputHeader(action, object_kind, gl_object_name, gl_from = ''):
@@ -1,10 +1,10 @@
 #!/usr/bin/python3
 
-import click,gitlab
+import click
 from click_help_colors import HelpColorsGroup, HelpColorsCommand
-from . import common,get
+from . import common,index,commands
 
-@click.group(cls=HelpColorsGroup, help_headers_color='yellow', help_options_color='green')
+@click.group(cls=HelpColorsGroup, help_headers_color='yellow', help_options_color='green', short_help=commands.shortHelp('create'))
 def create():
     """Create any element listed in 'Commands' section.
 
@@ -34,8 +34,9 @@ def createCommandProject(project_name, description, default_branch, group, visib
         # Check If any of the command options were defined, then If true, add them to the project JSON
         if group != None:
             common.clickOutputHeader('Creating', 'Project', group + '/' + project_name)
-            if gl.groups.list(search=group): # Check If group exists before doing anything...
-                project_json['namespace_id'] = gl.groups.list(search=group)[0].id
+            namespace_id = index.lookupId(gl, 'group', group, revalidate=True)
+            if namespace_id is not None: # Check If group exists before doing anything...
+                project_json['namespace_id'] = namespace_id
             else:
                 common.clickOutputMessage('ERROR', 'red', 'The group does not exist.')
                 return 1
@@ -46,7 +47,7 @@ def createCommandProject(project_name, description, default_branch, group, visib
         if description != None:
             project_json['description'] = description
         if default_branch != None:
-            project_json['default-branch'] = default_branch
+            project_json['default_branch'] = default_branch
     
         # Generic data 
         project_json['name'] = project_name
@@ -57,16 +58,11 @@ def createCommandProject(project_name, description, default_branch, group, visib
         project = gl.projects.create(project_json)
         common.clickOutputMessage('OK', 'green', 'Your project has been created! Please, check your Gitlab UI!')
 
-        # In case of initialization, create the README.md (or not!)
+        # In case of initialization, create the README.md (or not!) in the project Gitlab just returned
         if initialize or default_branch == None:
-            if group != None: # If namespace were defined, we must adjust the init_project value so we don't point to a wrong project
-                init_project = gl.projects.get(group + '/' + project_name)
-            else:
-                init_project = gl.projects.get(common.getTokenUsername(gl) + '/' + project_name)
-
             # Check If there's a default branch so project is initialized with it!
             if default_branch != None:
-                branch = defaultbranch
+                branch = default_branch
             else:
                 branch = 'master'
 
@@ -74,7 +70,7 @@ def createCommandProject(project_name, description, default_branch, group, visib
                                       + click.style(branch, fg='yellow') + '> branch') 
 
             # File creation
-            init_file = init_project.files.create({'file_path': 'README.md',
+            init_file = project.files.create({'file_path': 'README.md',
                                                   'branch': branch,
                                                   'content': '# Initial README of project ' + project_name,
                                                   'commit_message': 'Initial commit'})
@@ -87,19 +83,37 @@ def createCommandProject(project_name, description, default_branch, group, visib
 
 @create.command('branch', short_help='Create a branch from another one')
 @click.option('--reference', '--ref', '-r', default='master', help="Choose which branch to use as a reference")
-@click.option('--project-name', '-p', required=True, help="Select which project to use. Must be <group>/<project_path>.")
+@click.option('--project-name', '-p', help="Select which project to use. Must be <group>/<project_path>.")
+@click.option('--projects-from', type=click.File('r'), help="File with one <group>/<project_path> per line, to create the branch in all of them")
+@click.option('--parallel', type=click.IntRange(1, 32), default=8, help="Amount of projects handled concurrently when using --projects-from")
 @click.option('--url', help="URL directing to Gitlab")
 @click.option('--token', help="Private token to access Gitlab")
 @click.argument('branch_name')
-def createCommandBranch(branch_name, project_name, reference, url, token):
+def createCommandBranch(branch_name, project_name, projects_from, parallel, reference, url, token):
     """Easily create a new branch in a specific project in your Gitlab!
 
     Useful when implementing a process where a branch is created due to
     a Client creating a new feature to be developed, or simply automating the branches creation.
+
+    Use --projects-from to fan the branch out to many projects at once.
     """
+    if projects_from:
+        gl = common.performConnection(url, token)
+        projects = common.readProjectsFile(projects_from)
+        common.clickOutputHeader('Creating', 'Branch', branch_name, str(len(projects)) + ' projects (' + reference + ')')
+
+        failures = common.runParallelOperations(projects, lambda p: gl.projects.get(p, lazy=True).branches.create({'branch': branch_name, 'ref': reference}), parallel)
+        if failures:
+            click.get_current_context().exit(1)
+        return
+
+    if project_name is None:
+        common.clickOutputMessage('ERROR', 'red', 'Define the project with --project-name or a list of projects with --projects-from.')
+        return 1
+
     try:
         gl = common.performConnection(url, token)
-        branch_project = gl.projects.get(project_name)
+        branch_project = gl.projects.get(project_name, lazy=True)
         branch_project.branches.create({'branch': branch_name, 'ref': reference})
         common.clickOutputHeader('Creating', 'Branch', branch_name, project_name + ' (' + reference + ')')
         common.clickOutputMessage('OK', 'green', 'Branch <' 
@@ -111,16 +125,29 @@ def createCommandBranch(branch_name, project_name, reference, url, token):
 
 @create.command('tag', short_help='Create a tag inside a project')
 @click.option('--reference', '--ref', '-r', default="master", help="Choose which branch to use as a reference")
-@click.option('--project-name', '-p', required=True, help="Select the project in which to create the branch. Must be <group>/<project_path>.")
+@click.option('--project-name', '-p', help="Select the project in which to create the branch. Must be <group>/<project_path>.")
+@click.option('--projects-from', type=click.File('r'), help="File with one <group>/<project_path> per line, to create the tag in all of them")
+@click.option('--parallel', type=click.IntRange(1, 32), default=8, help="Amount of projects handled concurrently when using --projects-from")
 @click.option('--url', help="URL directing to Gitlab")
 @click.option('--token', help="Private token to access Gitlab")
 @click.argument('tag_name')
-def createCommandTag(tag_name, reference, project_name, url, token):
+def createCommandTag(tag_name, reference, project_name, projects_from, parallel, url, token):
     """Create a Tag inside a project using the specified branch as a reference.
     
-    Project name MUST be provided in the form <group>/<project_name>."""
+    Project name MUST be provided in the form <group>/<project_name>.
+    Use --projects-from to create the same tag in many projects at once."""
+
+    if projects_from:
+        gl = common.performConnection(url, token)
+        projects = common.readProjectsFile(projects_from)
+        common.clickOutputHeader('Creating', 'Tag', tag_name, str(len(projects)) + ' projects (' + reference + ')')
+
+        failures = common.runParallelOperations(projects, lambda p: gl.projects.get(p, lazy=True).tags.create({'tag_name': tag_name, 'ref': reference}), parallel)
+        if failures:
+            click.get_current_context().exit(1)
+        return
 
-    if(len(project_name.split('/')) != 2):
+    if project_name is None or len(project_name.split('/')) != 2:
         common.clickOutputMessage('ERROR', 'red', 'The --project-name or -p option should be defined as <group>/<project_path>.')
         return 1
 
@@ -128,8 +155,7 @@ def createCommandTag(tag_name, reference, project_name, url, token):
         gl = common.performConnection(url, token)
         
         common.clickOutputHeader('Creating', 'Tag', tag_name, project_name + ' (' + reference + ')')
-        project = gl.projects.get(project_name)
-        tag_project = gl.projects.get(project.id)
+        tag_project = gl.projects.get(project_name, lazy=True)
         common.clickOutputMessage('TAGGING', 'yellow', 'Creating the tag <' 
                    + click.style(tag_name, fg='yellow') + '> in the project <' 
                    + click.style(project_name, fg='yellow')  + '> ... Please, wait.')
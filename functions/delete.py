@@ -1,14 +1,15 @@
 #!/usr/bin/python3
 
-import gitlab,click,os,json
+import click,os,json,fnmatch
+from concurrent import futures
 from click_help_colors import HelpColorsGroup, HelpColorsCommand
-from . import common
+from . import common,index,commands
 
 def deleteGitlabElement(kind, gitlab_object, auto_confirm, project_name = '', branch_name = '', tag_name = '', user_id = '', group_id = ''):
     user_name = group_name = ''
     
     if 'project' in kind or 'branch' in kind or 'tag' in kind:
-        element = gitlab_object.projects.get(project_name)
+        element = gitlab_object.projects.get(project_name, lazy=True) # Deleting by path needs no previous request
     elif user_id != '': 
         user_name = gitlab_object.users.get(user_id).username
     elif group_id != '':
@@ -43,7 +44,7 @@ def deleteGitlabElement(kind, gitlab_object, auto_confirm, project_name = '', br
     common.clickOutputMessage('OK', 'green', kind.capitalize() + ' has been deleted successfuly')
 
 
-@click.group(cls=HelpColorsGroup, help_headers_color='yellow', help_options_color='green')
+@click.group(cls=HelpColorsGroup, help_headers_color='yellow', help_options_color='green', short_help=commands.shortHelp('delete'))
 def delete():
     """Delete any element listed in 'Commands' section.
 
@@ -75,26 +76,80 @@ def deleteCommandProject(project_name, auto_confirm, url, token):
             raise click.ClickException(e)
 
 
+def findBranchesByPattern(gitlab_object, project_name, pattern): # Unprotected, non-default branches of a project matching a shell pattern
+    project = gitlab_object.projects.get(project_name, lazy=True)
+    return [(project_name, b.name) for b in project.branches.list(iterator=True, per_page=100)
+            if fnmatch.fnmatchcase(b.name, pattern) and not b.protected and not getattr(b, 'default', False)]
+
+
+def deleteBranchesInBulk(gitlab_object, projects, branch_name, pattern, auto_confirm, parallel): # Deletes many branches concurrently, reporting every one of them
+    if pattern:
+        common.clickOutputMessage('SEARCHING', 'yellow', 'Looking for branches matching <' + click.style(pattern, fg='yellow') + '> in '
+                                  + str(len(projects)) + ' projects... Protected and default branches are skipped.')
+        with futures.ThreadPoolExecutor(max_workers=parallel) as executor:
+            matches = executor.map(lambda p: findBranchesByPattern(gitlab_object, p, pattern), projects)
+            branches = [branch for project_branches in matches for branch in project_branches]
+    else:
+        branches = [(project_name, branch_name) for project_name in projects]
+
+    if not branches:
+        common.clickOutputMessage('OK', 'green', 'There are no branches to delete')
+        return {}
+
+    common.clickOutputMessage('WARNING', 'yellow', 'You are about to delete <' + click.style(str(len(branches)), fg='yellow') + '> branches from <'
+                              + click.style(str(len(set(p for p, b in branches))), fg='yellow') + '> projects.')
+    if not common.askForConfirmation(auto_confirm, 'Are you sure you want to do this? (yes/no): ', 'You decided not to delete the branches.'):
+        return {}
+
+    print('--------------------------------------------------------------------------------------')
+    return common.runParallelOperations(branches, lambda pb: gitlab_object.projects.get(pb[0], lazy=True).branches.delete(pb[1]),
+                                        parallel, label=lambda pb: pb[0] + ' <' + pb[1] + '>')
+
+
 @delete.command('branch', short_help="Delete a Branch from a Project")
-@click.option('--project-name', '-p', required=True, help="Project to delete the branch from. Must be '<group>/<project_path>'")
+@click.option('--project-name', '-p', help="Project to delete the branch from. Must be '<group>/<project_path>'")
+@click.option('--projects-from', type=click.File('r'), help="File with one <group>/<project_path> per line, to delete the branch from all of them")
+@click.option('--pattern', help="Delete every branch matching this shell pattern, i.e. 'feature/*'")
+@click.option('--parallel', type=click.IntRange(1, 32), default=8, help="Amount of deletions done concurrently in bulk mode")
 @click.option('--auto-confirm', '--yes', is_flag=True, help="Enable auto confirm")
 @click.option('--url', help='URL directing to Gitlab')
 @click.option('--token', help="Private token to access Gitlab")
-@click.argument('branch_name')
-def deleteCommandBranch(branch_name, project_name, auto_confirm, url, token):
+@click.argument('branch_name', required=False)
+def deleteCommandBranch(branch_name, project_name, projects_from, pattern, parallel, auto_confirm, url, token):
     """Delete a Branch from a Gitlab Project
 
-    You must define the --project-name option in the form of '<group>/<project_path>' or It won't work!"""
+    You must define the --project-name option in the form of '<group>/<project_path>' or It won't work!
+
+    Use --pattern and/or --projects-from to delete many branches at once.
+    """
     
-    if not common.validateProjectName(project_name):
-        return 1
+    if projects_from:
+        projects = common.readProjectsFile(projects_from)
+    elif project_name is not None and common.validateProjectName(project_name):
+        projects = [project_name]
     else:
-        try:
-            gl = common.performConnection(url, token)
+        if project_name is None:
+            common.clickOutputMessage('ERROR', 'red', 'Define the project with --project-name or a list of projects with --projects-from.')
+        return 1
+
+    if (branch_name is None) == (pattern is None):
+        common.clickOutputMessage('ERROR', 'red', 'Define either a BRANCH_NAME or a --pattern to delete.')
+        return 1
+
+    try:
+        gl = common.performConnection(url, token)
+
+        if pattern or projects_from:
+            common.clickOutputHeader('Deleting', 'Branches', pattern or branch_name, str(len(projects)) + ' projects')
+            if deleteBranchesInBulk(gl, projects, branch_name, pattern, auto_confirm, parallel):
+                click.get_current_context().exit(1)
+        else:
             common.clickOutputHeader('Deleting', 'Branch', branch_name, project_name)
             deleteGitlabElement('branch', gl, auto_confirm, project_name, branch_name)
-        except Exception as e:
-            raise click.ClickException(e)
+    except click.exceptions.Exit:
+        raise
+    except Exception as e:
+        raise click.ClickException(e)
 
 
 @delete.command('tag', short_help="Delete a Tag from a Branch inside a Project")
@@ -124,15 +179,19 @@ def deleteCommandTag(tag_name, project_name, auto_confirm, url, token):
 @click.option('--auto-confirm', '--yes', required=False, is_flag=True, help="Enable auto confirm")
 @click.option('--url', help='URL directing to Gitlab')
 @click.option('--token', help="Private token to access Gitlab")
-@click.argument('user_id', type=int)
-def deleteCommandUser(user_id, auto_confirm, url, token):
+@click.argument('user')
+def deleteCommandUser(user, auto_confirm, url, token):
     """Delete an User from Gitlab
 
-    You must define the user by ID. You can find it by using the subcommand 'gcli get user id -u <user_name>'.
+    You can define the user by username or by ID.
     """
     
     try:
         gl = common.performConnection(url, token)
+        user_id = index.lookupId(gl, 'user', user, revalidate=True, accepts_id=True)
+        if user_id is None:
+            common.clickOutputMessage('ERROR', 'red', 'Could not find user <' + click.style(user, fg='yellow') + '> in Gitlab...')
+            return 1
         common.clickOutputHeader('Deleting', 'User', gl.users.get(user_id).username)
         deleteGitlabElement('user', gl, auto_confirm, '', '', '', user_id)
     except Exception as e:
@@ -143,15 +202,19 @@ def deleteCommandUser(user_id, auto_confirm, url, token):
 @click.option('--auto-confirm', '--yes', is_flag=True, help="Enable auto confirm")
 @click.option('--url', help='URL directing to Gitlab')
 @click.option('--token', help="Private token to access Gitlab")
-@click.argument('group_id', type=int)
-def deleteCommandGroup(group_id, auto_confirm, url, token):
+@click.argument('group')
+def deleteCommandGroup(group, auto_confirm, url, token):
     """Delete a Group from Gitlab
 
-    You must define the group by its ID. You can find it by using the subcommand 'gcli get group id -g <group_name>'
+    You can define the group by its full path or by its ID.
     """
 
     try:
         gl = common.performConnection(url, token)
+        group_id = index.lookupId(gl, 'group', group, revalidate=True, accepts_id=True)
+        if group_id is None:
+            common.clickOutputMessage('ERROR', 'red', 'Could not find group <' + click.style(group, fg='yellow') + '> in Gitlab...')
+            return 1
         common.clickOutputHeader('Deleting', 'Group', gl.groups.get(group_id).name)
         deleteGitlabElement('group', gl, auto_confirm, '', '', '', '', group_id)
     except Exception as e:
@@ -1,22 +1,88 @@
 #!/usr/bin/python3
 
-import gitlab,click,os
+import click,os,math,datetime,itertools,collections.abc
+from concurrent import futures
 from click_help_colors import HelpColorsGroup, HelpColorsCommand
-from . import common
+from . import common,commands
 
 
-def findSpecificValue(kind, search_result, search_element):
+def findSpecificValue(kind, gl_object, search_element): # Resolve the element through the local index instead of looping over a whole list
+    from . import index
+
     try:
-        for i in search_result:
-            if kind == 'user':
-                if i.username == search_element:
-                    return i
-            elif kind == 'group':
-                if i.path == search_element:
-                    return i
+        element_id = index.lookupId(gl_object, kind, search_element)
+        if element_id is not None:
+            return getattr(gl_object, kind + 's').get(element_id)
+
+    except Exception:
+        pass
+
+    common.clickOutputMessage('ERROR', 'red', 'Could not find ' + kind + ' <' + click.style(search_element, fg='yellow') + '> in Gitlab...')
+
+
+def buildListFilters(**filters): # Only the filters actually defined are pushed down to Gitlab as query parameters
+    list_filters = {}
+    for key, value in filters.items():
+        if value is None or value is False:
+            continue
+        elif value in ('True', 'False'):
+            value = (value == 'True')
+        elif isinstance(value, datetime.datetime):
+            value = value.isoformat()
+        list_filters[key] = value
+
+    return list_filters
+
+
+def requestGitlabList(gl_manager, **list_params): # Plain dictionaries, building a python-gitlab object per element costs more than the request
+    return gl_manager.gitlab.http_list(gl_manager.path, **list_params)
+
+
+def listGitlabElements(gl_manager, page_size, limit, keyset=False, parallel=1, **list_filters): # Lazily walks every page of a list, holding one page in memory
+    if limit:
+        page_size = min(page_size, limit)
+
+    if parallel > 1:
+        results = prefetchGitlabPages(gl_manager, page_size, limit, parallel, list_filters)
+    else:
+        if keyset and 'order_by' not in list_filters: # Keyset pagination keeps deep pages as cheap as the first one
+            list_filters.update({'pagination': 'keyset', 'order_by': 'id', 'sort': 'asc'})
+
+        results = requestGitlabList(gl_manager, iterator=True, per_page=page_size, **list_filters)
+
+    if limit:
+        return itertools.islice(results, limit)
+    else:
+        return results
+
+
+def prefetchGitlabPages(gl_manager, page_size, limit, parallel, list_filters): # Fetches offset pages concurrently, yielding them in their original order
+    first_page = requestGitlabList(gl_manager, iterator=True, per_page=page_size, **list_filters)
+    first_items = list(itertools.islice(first_page, page_size))
+    yield from first_items
+
+    last_page = first_page.total_pages # Gitlab omits it past 10k elements, pages are then requested until a short one comes back
+    if limit:
+        last_page = min(last_page or math.inf, -(-limit // page_size))
+    if len(first_items) < page_size:
+        return
 
-    except:
-        common.clickOutputMessage('ERROR', 'red', 'Could not find ' + kind + ' <' + click.style(search_element, fg='yellow') + '> in Gitlab...')
+    with futures.ThreadPoolExecutor(max_workers=parallel) as executor:
+        pending = collections.deque()
+        next_page = 2
+        last_page = last_page or math.inf
+
+        while pending or next_page <= last_page:
+            while next_page <= last_page and len(pending) < parallel * 2: # Bounded window so memory does not grow with the instance
+                pending.append(executor.submit(requestGitlabList, gl_manager, page=next_page, per_page=page_size, **list_filters))
+                next_page += 1
+
+            items = pending.popleft().result()
+            yield from items
+            if len(items) < page_size: # The end of a collection Gitlab didn't count, the pages requested after it are empty
+                for page in pending:
+                    page.cancel()
+                return
 
 
 def printParameters(gl_object, parameter, sub_parameter, pretty_print, pretty_sort): # Prints parameters from non-plural 'get' subcommands
@@ -24,44 +90,82 @@ def printParameters(gl_object, parameter, sub_parameter, pretty_print, pretty_so
         dict_object = common.transformToDict(gl_object)
     
         if parameter == 'all':
-            outputResultsList(False, gl_object, False, pretty_print, pretty_sort, False)
+            if pretty_print or pretty_sort:
+                outputResultsList(gl_object, 'json', False, None, pretty_sort)
+            else:
+                outputResultsList(gl_object, 'ndjson', False)
         elif sub_parameter is not None:
-            print(dict_object[parameter][sub_parameter])
+            common.outputWrite(str(dict_object[parameter][sub_parameter]))
         else:
-            print(dict_object[parameter])
+            common.outputWrite(str(dict_object[parameter]))
 
     except Exception as e:
         if not outputParameterError(parameter, sub_parameter, e):
             raise click.ClickException(e)
 
 
-def outputResultsList(raw, gl_object, specific_value, pretty_print, sort_json, use_path): # Prints different outputs: JSON, colorful value, raw value...
-    if sort_json or pretty_print:
-        specific_value = False
-        pretty_print = True
+simple_project_fields = ('id', 'description', 'name', 'name_with_namespace', 'path', 'path_with_namespace', 'created_at', 'default_branch', 'tag_list', 'topics',
+                         'ssh_url_to_repo', 'http_url_to_repo', 'web_url', 'readme_url', 'forks_count', 'avatar_url', 'star_count', 'last_activity_at', 'namespace')
+
+
+def isNameOnly(output_format, fields): # Only a name is printed, so neither full representations nor objects are needed
+    return output_format == 'text' and not fields
+
+
+def isSimpleEnough(output_format, fields): # Gitlab's simple project representation holds everything printed
+    return isNameOnly(output_format, fields) or bool(fields) and set(fields) <= set(simple_project_fields)
+
+
+def resolveOutputFormat(output_format, raw, verbose, pretty_print, pretty_sort): # Maps the legacy --raw/--verbose/--pretty flags to an --output format
+    if raw:
+        common.setOutputStyling(False)
 
-    if specific_value:
+    if output_format is not None:
+        return output_format
+    elif pretty_print or pretty_sort:
+        return 'json'
+    elif verbose:
+        return 'ndjson'
+    else:
+        return 'text'
+
+
+def elementValue(gl_object, key): # Works for python-gitlab objects and for plain dictionaries alike
+    if isinstance(gl_object, collections.abc.Mapping):
+        return gl_object[key]
+    else:
+        return getattr(gl_object, key)
+
+
+def outputResultsList(gl_object, output_format, use_path, fields=None, sort_json=False): # Prints different outputs: JSON, NDJSON, CSV/TSV or just the element name
+    if output_format == 'text' and not fields:
         if use_path == "namespace":
-            printable = gl_object.path_with_namespace
+            printable = elementValue(gl_object, 'path_with_namespace')
         elif use_path == "username":
-            printable = gl_object.username
+            printable = elementValue(gl_object, 'username')
         elif use_path == "path":
-            printable = gl_object.path
+            printable = elementValue(gl_object, 'path')
+        elif use_path == "project":
+            printable = elementValue(gl_object, 'project') + ':' + elementValue(gl_object, 'name')
         else:
-            printable = gl_object.name
-    else:
-        printable = common.transformToDict(gl_object)
-
-    if raw and not pretty_print:
-        print(printable)
-    elif not specific_value:
-        if pretty_print:
-            json_object = common.transformToJson(printable)
-            common.prettyPrintJson(json_object, sort_json)
+            printable = elementValue(gl_object, 'name')
+
+        if common.isOutputStyled():
+            common.outputWrite('[' + click.style(printable, fg='yellow') + ']')
         else:
-            print(printable)
-    else:
-        click.echo('[' + click.style(printable, fg='yellow') + ']')
+            common.outputWrite(str(printable))
+        return
+
+    dict_object = common.transformToDict(gl_object, fields)
+
+    if output_format == 'json':
+        common.prettyPrintJson(dict_object, sort_json)
+    elif output_format == 'csv':
+        common.outputTableRow(dict_object, fields, ',')
+    elif output_format == 'tsv':
+        common.outputTableRow(dict_object, fields, '\t')
+    else: # One compact JSON document per line
+        common.outputWrite(common.encodeJson(dict_object, False, sort_json))
 
 
 def outputParameterError(parameter, sub_parameter, e): # Function to return failure on parameter retrieval
@@ -81,7 +185,7 @@ def outputParameterError(parameter, sub_parameter, e): # Function to return fail
         return False
 
 
-@click.group(cls=HelpColorsGroup, help_headers_color='yellow', help_options_color='green')
+@click.group(cls=HelpColorsGroup, help_headers_color='yellow', help_options_color='green', short_help=commands.shortHelp('get'))
 def get():
     """Get any element listed in 'Commands' section.
 
@@ -93,26 +197,50 @@ def get():
 
 @get.command('projects', short_help="Get all projects in Gitlab")
 @click.option('--group', '-g', help="Specific group to search in")
-@click.option('--raw', is_flag=True, help="Display results in raw format (just text), not available if using --verbose")
-@click.option('--verbose', '-v', is_flag=True, help="Enable verbose output, full JSON string")
+@click.option('--search', help="Only projects matching this search string")
+@click.option('--owned', is_flag=True, help="Only projects owned by the current user")
+@click.option('--membership', is_flag=True, help="Only projects the current user is a member of")
+@click.option('--archived', type=click.Choice(['True', 'False']), help="Only archived or non-archived projects")
+@click.option('--visibility', type=click.Choice(['public', 'internal', 'private']), help="Only projects with this visibility")
+@click.option('--last-activity-after', type=click.DateTime(), help="Only projects with activity after this date")
+@click.option('--order-by', type=click.Choice(['id', 'name', 'path', 'created_at', 'updated_at', 'last_activity_at']), help="Order projects by this field")
+@click.option('--raw', is_flag=True, hidden=True, help="Deprecated, plain text is used automatically when stdout is not a terminal")
+@click.option('--verbose', '-v', is_flag=True, hidden=True, help="Deprecated, use --output ndjson")
 @click.option('--with-namespace', is_flag=True, help="Show project name in namespace form")
-@click.option('--pretty-print', '--pretty', is_flag=True, help="Show JSON beautifully")
-@click.option('--pretty-sort', '--sort', '-s', is_flag=True, help="Sort output of pretty-print option")
+@click.option('--pretty-print', '--pretty', is_flag=True, hidden=True, help="Deprecated, use --output json")
+@click.option('--pretty-sort', '--sort', '-s', is_flag=True, help="Sort the keys of JSON outputs")
+@click.option('--page-size', type=click.IntRange(1, 100), default=100, help="Amount of projects requested per API page")
+@click.option('--limit', type=click.IntRange(0), default=0, help="Maximum amount of projects to output (0 means no limit)")
+@click.option('--parallel', type=click.IntRange(1, 32), default=1, help="Amount of projects pages fetched concurrently (offset pagination)")
+@click.option('--fields', callback=common.parseFieldsOption, help="Comma separated list of fields to output, i.e. 'id,name'")
+@click.option('--output', '-o', 'output_format', type=click.Choice(['text', 'json', 'ndjson', 'csv', 'tsv']), help="Output format, defaults to text")
+@click.option('--from-snapshot', is_flag=True, help="Answer from the local snapshot (see 'glabctl snapshot') without asking Gitlab")
 @click.option('--url', help='URL directing to Gitlab')
 @click.option('--token', help="Private token to access Gitlab")
-def getCommandProjects(group, raw, verbose, with_namespace, pretty_print, pretty_sort, url, token):
+def getCommandProjects(group, search, owned, membership, archived, visibility, last_activity_after, order_by, raw, verbose, with_namespace, pretty_print, pretty_sort, page_size, limit, parallel, fields, output_format, from_snapshot, url, token):
     """A subcommand to list all projects in Gitlab
 
     You can filter by Gitlab group using the corresponding option!
+    Every other filter is applied by Gitlab itself, so only the matching projects are transferred.
+    Results are streamed page by page, so big instances start printing right away.
+    Name listings, and --fields only naming simple attributes (id, name, path, path_with_namespace, web_url...),
+    ask Gitlab for its simple project representation, a fraction of the full one.
     """
-    gl = common.performConnection(url, token)
+    output_format = resolveOutputFormat(output_format, raw, verbose, pretty_print, pretty_sort)
+    list_filters = buildListFilters(search=search, owned=owned, membership=membership, archived=archived, visibility=visibility,
+                                    last_activity_after=last_activity_after, order_by=order_by, simple=isSimpleEnough(output_format, fields) and not from_snapshot)
 
     try:
-        if group:
-            search_group = gl.groups.get(group)
-            projects = search_group.projects.list()
+        if from_snapshot:
+            from . import snapshot
+            projects = snapshot.readSnapshot(url, token, 'projects', limit, **dict(list_filters, **buildListFilters(group=group)))
+        elif group:
+            gl = common.performConnection(url, token)
+            search_group = gl.groups.get(group, lazy=True)
+            projects = listGitlabElements(search_group.projects, page_size, limit, parallel=parallel, **list_filters)
         else:
-            projects = gl.projects.list()
+            gl = common.performConnection(url, token)
+            projects = listGitlabElements(gl.projects, page_size, limit, keyset=True, parallel=parallel, **list_filters)
         
         for p in projects:
             if with_namespace:
@@ -120,7 +248,7 @@ def getCommandProjects(group, raw, verbose, with_namespace, pretty_print, pretty
             else:
                 output_parameter = "placeholder"
             
-            outputResultsList(raw, p, not verbose, pretty_print, pretty_sort, output_parameter)
+            outputResultsList(p, output_format, output_parameter, fields, pretty_sort)
 
     except Exception as e:
         raise click.ClickException(e)
@@ -150,51 +278,135 @@ def getCommandProject(project_name, pretty_print, pretty_sort, parameter, sub_pa
         printParameters(gl.projects.get(project_name), parameter, sub_parameter, pretty_print, pretty_sort)
 
 
+def branchesWithProject(project, branches): # Branches as dictionaries tagged with their project, for multi-project listings
+    for b in branches:
+        branch = common.transformToDict(b)
+        branch['project'] = project['path_with_namespace']
+        yield branch
+
+
 @get.command('branches', short_help='Get all branches inside a Project')
-@click.option('--raw', is_flag=True, help="Output branches without color")
-@click.option('--verbose', '-v', is_flag=True, help="Output branches JSON object")
-@click.option('--pretty-print', '--pretty', is_flag=True, help="Show JSON beautifully")
-@click.option('--pretty-sort', '--sort', '-s', is_flag=True, help="Sort output of pretty-print option")
+@click.option('--all-projects', is_flag=True, help="List the branches of every project, or of every project in --group")
+@click.option('--group', '-g', help="Only look into this group's projects when using --all-projects")
+@click.option('--async', 'use_async', is_flag=True, help="Overlap the requests of --all-projects with the asyncio engine (needs aiohttp)")
+@click.option('--concurrency', type=click.IntRange(1, 256), default=32, help="Maximum amount of requests in flight with --async")
+@click.option('--search', help="Only branches matching this search string, '^' and '$' anchor it")
+@click.option('--raw', is_flag=True, hidden=True, help="Deprecated, plain text is used automatically when stdout is not a terminal")
+@click.option('--verbose', '-v', is_flag=True, hidden=True, help="Deprecated, use --output ndjson")
+@click.option('--pretty-print', '--pretty', is_flag=True, hidden=True, help="Deprecated, use --output json")
+@click.option('--pretty-sort', '--sort', '-s', is_flag=True, help="Sort the keys of JSON outputs")
+@click.option('--page-size', type=click.IntRange(1, 100), default=100, help="Amount of branches requested per API page")
+@click.option('--limit', type=click.IntRange(0), default=0, help="Maximum amount of branches to output (0 means no limit)")
+@click.option('--parallel', type=click.IntRange(1, 32), default=1, help="Amount of branches pages fetched concurrently (offset pagination)")
+@click.option('--fields', callback=common.parseFieldsOption, help="Comma separated list of fields to output, i.e. 'id,name'")
+@click.option('--output', '-o', 'output_format', type=click.Choice(['text', 'json', 'ndjson', 'csv', 'tsv']), help="Output format, defaults to text")
+@click.option('--from-snapshot', is_flag=True, help="Answer from the local snapshot (see 'glabctl snapshot') without asking Gitlab")
 @click.option('--url', help="URL directing to Gitlab")
 @click.option('--token', help="Private token to access Gitlab")
-@click.argument('project_name')
-def getCommandBranches(project_name, raw, verbose, pretty_print, pretty_sort, url, token):
-    """With this command you can get a list of all branches inside a Project."""
-    
-    if common.validateProjectName(project_name):
+@click.argument('project_name', required=False)
+def getCommandBranches(project_name, all_projects, group, use_async, concurrency, search, raw, verbose, pretty_print, pretty_sort, page_size, limit, parallel, fields, output_format, from_snapshot, url, token):
+    """With this command you can get a list of all branches inside a Project.
+
+    Use --all-projects to audit the branches of every project instead. Adding --async
+    overlaps hundreds of those requests, and results come out as they arrive.
+    """
+    output_format = resolveOutputFormat(output_format, raw, verbose, pretty_print, pretty_sort)
+    branch_filters = buildListFilters(search=search)
+
+    if from_snapshot and (all_projects or project_name):
+        from . import snapshot
+        if all_projects:
+            snapshot_filters = buildListFilters(group=group)
+        else:
+            snapshot_filters = buildListFilters(project=project_name)
+        for b in snapshot.readSnapshot(url, token, 'branches', limit, **snapshot_filters, **branch_filters):
+            outputResultsList(b, output_format, 'project' if all_projects else False, fields, pretty_sort)
+
+    elif all_projects:
+        if use_async:
+            from . import asyncapi
+
+            try:
+                failures = asyncapi.listAllProjectsBranches(url, token, group, {}, branch_filters, page_size, concurrency, limit,
+                                                            lambda branch: outputResultsList(branch, output_format, 'project', fields, pretty_sort))
+            except Exception as e:
+                raise click.ClickException(e)
+            for failed_project, error in failures.items():
+                common.clickOutputMessage('FAILED', 'red', failed_project + ': ' + error)
+            if failures:
+                click.get_current_context().exit(1)
+            return
+
+        gl = common.performConnection(url, token)
+        try:
+            if group:
+                projects = listGitlabElements(gl.groups.get(group, lazy=True).projects, page_size, 0, simple=True)
+            else:
+                projects = listGitlabElements(gl.projects, page_size, 0, keyset=True, simple=True)
+
+            branches = itertools.chain.from_iterable(branchesWithProject(p, listGitlabElements(gl.projects.get(p['id'], lazy=True).branches, page_size, 0, parallel=parallel, **branch_filters))
+                                                     for p in projects)
+            if limit:
+                branches = itertools.islice(branches, limit)
+
+            for b in branches:
+                outputResultsList(b, output_format, 'project', fields, pretty_sort)
+        except Exception as e:
+            raise click.ClickException(e)
+
+    elif project_name is None:
+        common.clickOutputMessage('ERROR', 'red', 'Define a PROJECT_NAME or use --all-projects.')
+        return 1
+
+    elif common.validateProjectName(project_name):
         gl = common.performConnection(url, token)
 
         try:
             project = gl.projects.get(project_name)
-            branches = project.branches.list()
+            branches = listGitlabElements(project.branches, page_size, limit, parallel=parallel, **branch_filters)
             for b in branches:
-                outputResultsList(raw, b, not verbose, pretty_print, pretty_sort, False)
+                outputResultsList(b, output_format, False, fields, pretty_sort)
         except Exception as e:
             raise click.ClickException(e)
 
 
 @get.command('users', short_help='Get registered users')
 @click.option('--username', '-u', help="Username to search")
+@click.option('--search', help="Only users whose name, username or email match this search string")
+@click.option('--order-by', type=click.Choice(['id', 'name', 'username', 'created_at', 'updated_at']), help="Order users by this field")
 @click.option('--output-username', is_flag=True, help="Output results using username")
-@click.option('--raw', is_flag=True, help="")
-@click.option('--verbose', '-v', is_flag=True, help="")
-@click.option('--pretty-print', '--pretty', is_flag=True, help="Show JSON beautifully")
-@click.option('--pretty-sort', '--sort', '-s', is_flag=True, help="Sort output of pretty-print option")
+@click.option('--raw', is_flag=True, hidden=True, help="Deprecated, plain text is used automatically when stdout is not a terminal")
+@click.option('--verbose', '-v', is_flag=True, hidden=True, help="Deprecated, use --output ndjson")
+@click.option('--pretty-print', '--pretty', is_flag=True, hidden=True, help="Deprecated, use --output json")
+@click.option('--pretty-sort', '--sort', '-s', is_flag=True, help="Sort the keys of JSON outputs")
+@click.option('--page-size', type=click.IntRange(1, 100), default=100, help="Amount of users requested per API page")
+@click.option('--limit', type=click.IntRange(0), default=0, help="Maximum amount of users to output (0 means no limit)")
+@click.option('--parallel', type=click.IntRange(1, 32), default=1, help="Amount of users pages fetched concurrently (offset pagination)")
+@click.option('--fields', callback=common.parseFieldsOption, help="Comma separated list of fields to output, i.e. 'id,name'")
+@click.option('--output', '-o', 'output_format', type=click.Choice(['text', 'json', 'ndjson', 'csv', 'tsv']), help="Output format, defaults to text")
+@click.option('--from-snapshot', is_flag=True, help="Answer from the local snapshot (see 'glabctl snapshot') without asking Gitlab")
 @click.option('--url', help="URL directing to Gitlab")
 @click.option('--token', help="Private token to access Gitlab")
-def getCommandUsers(username, output_username, raw, verbose, pretty_print, pretty_sort, url, token):
+def getCommandUsers(username, search, order_by, output_username, raw, verbose, pretty_print, pretty_sort, page_size, limit, parallel, fields, output_format, from_snapshot, url, token):
     """Simple users list, with some filters"""
-    gl = common.performConnection(url, token)
+    output_format = resolveOutputFormat(output_format, raw, verbose, pretty_print, pretty_sort)
 
     try:
-        users = gl.users.list(username=username)
+        list_filters = buildListFilters(username=username, search=search, order_by=order_by)
+        if from_snapshot:
+            from . import snapshot
+            users = snapshot.readSnapshot(url, token, 'users', limit, **list_filters)
+        else:
+            gl = common.performConnection(url, token)
+            users = listGitlabElements(gl.users, page_size, limit, parallel=parallel, **list_filters)
+
         for u in users:
             if output_username:
                 output_parameter = "username"
             else:
                 output_parameter = "placeholder"
                 
-            outputResultsList(raw, u, not verbose, pretty_print, pretty_sort, output_parameter)
+            outputResultsList(u, output_format, output_parameter, fields, pretty_sort)
 
     except Exception as e:
         raise click.ClickException(e)
@@ -213,21 +425,34 @@ def getCommandUser(username, parameter, pretty_print, pretty_sort, url, token):
     To get this full JSON, define the 'all' parameter when calling this subcommand."""
     
     gl = common.performConnection(url, token)
-    printParameters(gl.users.list(username=username)[0], parameter, None, pretty_print, pretty_sort)
+    user = findSpecificValue('user', gl, username)
+    if user is None:
+        return 1
+
+    printParameters(user, parameter, None, pretty_print, pretty_sort)
 
 
 @get.command('groups', short_help='Get groups created on Gitlab')
 @click.option('--group-name', '--group', '-g', help="Groups to search")
+@click.option('--search', help="Only groups matching this search string")
+@click.option('--owned', is_flag=True, help="Only groups owned by the current user")
+@click.option('--order-by', type=click.Choice(['name', 'path', 'id']), help="Order groups by this field")
 @click.option('--get-path', '--path', is_flag=True, help="Return the path parameter instead of the name one")
-@click.option('--verbose', '-v', is_flag=True, help="Enable verbose output")
-@click.option('--raw', is_flag=True, help="Disable style for Pipeline usage")
-@click.option('--pretty-print', '--pretty', is_flag=True, help="Show JSON beautifully")
-@click.option('--pretty-sort', '--sort', '-s', is_flag=True, help="Sort output of pretty-print option")
+@click.option('--verbose', '-v', is_flag=True, hidden=True, help="Deprecated, use --output ndjson")
+@click.option('--raw', is_flag=True, hidden=True, help="Deprecated, plain text is used automatically when stdout is not a terminal")
+@click.option('--pretty-print', '--pretty', is_flag=True, hidden=True, help="Deprecated, use --output json")
+@click.option('--pretty-sort', '--sort', '-s', is_flag=True, help="Sort the keys of JSON outputs")
+@click.option('--page-size', type=click.IntRange(1, 100), default=100, help="Amount of groups requested per API page")
+@click.option('--limit', type=click.IntRange(0), default=0, help="Maximum amount of groups to output (0 means no limit)")
+@click.option('--parallel', type=click.IntRange(1, 32), default=1, help="Amount of groups pages fetched concurrently (offset pagination)")
+@click.option('--fields', callback=common.parseFieldsOption, help="Comma separated list of fields to output, i.e. 'id,name'")
+@click.option('--output', '-o', 'output_format', type=click.Choice(['text', 'json', 'ndjson', 'csv', 'tsv']), help="Output format, defaults to text")
+@click.option('--from-snapshot', is_flag=True, help="Answer from the local snapshot (see 'glabctl snapshot') without asking Gitlab")
 @click.option('--url', help="URL directing to Gitlab")
 @click.option('--token', help="Private token to access Gitlab")
-def getCommandGroups(group_name, get_path, verbose, raw, pretty_print, pretty_sort, url, token):
+def getCommandGroups(group_name, search, owned, order_by, get_path, verbose, raw, pretty_print, pretty_sort, page_size, limit, parallel, fields, output_format, from_snapshot, url, token):
     """Simple groups list"""
-    gl = common.performConnection(url, token)
+    output_format = resolveOutputFormat(output_format, raw, verbose, pretty_print, pretty_sort)
 
     try:
         if get_path:
@@ -235,13 +460,21 @@ def getCommandGroups(group_name, get_path, verbose, raw, pretty_print, pretty_so
         else:
             output_parameter = "placeholder"
 
-        if group_name == None:
-            groups = gl.groups.list()
+        if from_snapshot:
+            from . import snapshot
+            list_filters = buildListFilters(full_path=group_name, search=search, owned=owned, order_by=order_by)
+            for g in snapshot.readSnapshot(url, token, 'groups', limit, **list_filters):
+                outputResultsList(g, output_format, output_parameter, fields, pretty_sort)
+        elif group_name == None:
+            gl = common.performConnection(url, token)
+            list_filters = buildListFilters(search=search, owned=owned, order_by=order_by)
+            groups = listGitlabElements(gl.groups, page_size, limit, parallel=parallel, **list_filters)
             for g in groups:
-                outputResultsList(raw, g, not verbose, pretty_print, pretty_sort, output_parameter)
+                outputResultsList(g, output_format, output_parameter, fields, pretty_sort)
         else:
+            gl = common.performConnection(url, token)
             groups = gl.groups.get(group_name)
-            outputResultsList(raw, groups, not verbose, pretty_print, pretty_sort, output_parameter)
+            outputResultsList(groups, output_format, output_parameter, fields, pretty_sort)
 
     except Exception as e:
         raise click.ClickException(e)
@@ -0,0 +1,166 @@
+#!/usr/bin/python3
+
+import click,os,time,sqlite3,threading,datetime
+from urllib.parse import quote
+from click_help_colors import HelpColorsGroup
+from . import common,cache,commands
+
+index_connections = {}
+index_lock = threading.Lock()
+
+index_kinds = { # Kind: (listing path, key attribute, incremental refresh filter)
+    'user': ('/users', 'username', 'created_after'),
+    'group': ('/groups', 'full_path', None),
+    'project': ('/projects', 'path_with_namespace', 'last_activity_after'),
+}
+
+
+def indexPath(gl_object): # One index per Gitlab host & token
+    return os.path.join(cache.cache_directory, 'index-' + cache.identityHash(gl_object.url, gl_object.private_token) + '.sqlite')
+
+
+def openIndex(gl_object): # SQLite connection to the index of this Gitlab, created on first use
+    if id(gl_object) not in index_connections:
+        os.makedirs(cache.cache_directory, mode=0o700, exist_ok=True)
+        connection = sqlite3.connect(indexPath(gl_object), check_same_thread=False)
+        connection.execute('CREATE TABLE IF NOT EXISTS elements (kind TEXT NOT NULL, key TEXT NOT NULL, id INTEGER NOT NULL, PRIMARY KEY (kind, key))')
+        connection.execute('CREATE TABLE IF NOT EXISTS refreshes (kind TEXT PRIMARY KEY, refreshed_at TEXT NOT NULL)')
+        index_connections[id(gl_object)] = connection
+    return index_connections[id(gl_object)]
+
+
+def cachedIds(gl_object, kind, keys): # {key: id} for the keys already in the index, without any request
+    keys = list(keys)
+    found = {}
+    with index_lock:
+        connection = openIndex(gl_object)
+        for start in range(0, len(keys), 500): # SQLite limits the amount of query parameters
+            chunk = keys[start:start + 500]
+            rows = connection.execute('SELECT key, id FROM elements WHERE kind = ? AND key IN (' + ','.join('?' * len(chunk)) + ')', [kind] + chunk)
+            found.update(rows)
+    return found
+
+
+def storeIds(gl_object, kind, ids): # ids is a {key: id} dictionary
+    with index_lock:
+        connection = openIndex(gl_object)
+        with connection:
+            connection.executemany('INSERT OR REPLACE INTO elements (kind, key, id) VALUES (?, ?, ?)', [(kind, key, element_id) for key, element_id in ids.items()])
+
+
+def requestId(gl_object, kind, key): # Index miss, ask Gitlab directly
+    from gitlab.exceptions import GitlabGetError, GitlabHttpError
+
+    try:
+        if kind == 'user':
+            users = gl_object.http_list('/users', username=key)
+            return users[0]['id'] if users else None
+        else:
+            return gl_object.http_get(index_kinds[kind][0] + '/' + quote(key, safe=''))['id']
+    except (GitlabGetError, GitlabHttpError) as e:
+        if e.response_code == 404:
+            return None
+        raise
+
+
+def forgetIds(gl_object, kind, keys): # Drop rows which don't name the right element anymore
+    with index_lock:
+        connection = openIndex(gl_object)
+        with connection:
+            connection.executemany('DELETE FROM elements WHERE kind = ? AND key = ?', [(kind, key) for key in keys])
+
+
+def verifyId(gl_object, kind, key, element_id, revalidate=False): # True when the element behind a cached ID still has this name
+    from gitlab.exceptions import GitlabGetError, GitlabHttpError
+
+    listing_path, key_attribute, refresh_filter = index_kinds[kind]
+    try: # Answered by the response cache for a few minutes, unless revalidate asks Gitlab again
+        element = gl_object.http_get(listing_path + '/' + str(element_id), extra_headers={'Cache-Control': 'no-cache'} if revalidate else None)
+    except (GitlabGetError, GitlabHttpError) as e:
+        if e.response_code == 404:
+            return False
+        raise
+    return str(element[key_attribute]).lower() == str(key).lower() # Gitlab names are case insensitive
+
+
+def lookupId(gl_object, kind, key, revalidate=False, accepts_id=False): # Name -> ID through the index, falling back to Gitlab when the name is unknown or was renamed
+    if accepts_id and str(key).isdigit(): # Only for commands documented as taking an ID, a username or group path can be made of digits
+        return int(key)
+
+    found = cachedIds(gl_object, kind, [key])
+    if key in found:
+        if verifyId(gl_object, kind, key, found[key], revalidate):
+            return found[key]
+        forgetIds(gl_object, kind, [key]) # Renamed, and maybe someone else took the name since
+
+    element_id = requestId(gl_object, kind, key)
+    if element_id is not None:
+        storeIds(gl_object, kind, {key: element_id})
+    return element_id
+
+
+def refreshIndex(gl_object, kind, full): # Only the elements changed since the last refresh are listed, unless full is set
+    listing_path, key_attribute, refresh_filter = index_kinds[kind]
+    list_filters = {}
+
+    with index_lock:
+        connection = openIndex(gl_object)
+        row = connection.execute('SELECT refreshed_at FROM refreshes WHERE kind = ?', (kind,)).fetchone()
+    if row and refresh_filter and not full:
+        list_filters[refresh_filter] = row[0]
+    if kind == 'project': # Keyset pagination keeps deep pages as cheap as the first one
+        list_filters.update({'pagination': 'keyset', 'order_by': 'id', 'sort': 'asc'})
+
+    refreshed_at = datetime.datetime.now(datetime.timezone.utc).isoformat() # Taken before listing, so nothing changed meanwhile is missed
+    ids = {}
+    for element in gl_object.http_list(listing_path, iterator=True, per_page=100, **list_filters):
+        ids[element[key_attribute]] = element['id']
+
+    with index_lock:
+        with connection:
+            if full or not refresh_filter: # A complete listing also drops the deleted elements
+                connection.execute('DELETE FROM elements WHERE kind = ?', (kind,))
+            else: # An element listed under a new name drops its old one
+                connection.executemany('DELETE FROM elements WHERE kind = ? AND id = ? AND key != ?', [(kind, element_id, key) for key, element_id in ids.items()])
+            connection.executemany('INSERT OR REPLACE INTO elements (kind, key, id) VALUES (?, ?, ?)', [(kind, key, element_id) for key, element_id in ids.items()])
+            connection.execute('INSERT OR REPLACE INTO refreshes (kind, refreshed_at) VALUES (?, ?)', (kind, refreshed_at))
+
+    return len(ids)
+
+
+@click.group(cls=HelpColorsGroup, help_headers_color='yellow', help_options_color='green', short_help=commands.shortHelp('index'))
+def index():
+    """Manage the local index resolving names to Gitlab IDs.
+
+    Usernames, group paths & project paths are resolved through a local
+    SQLite index, so commands taking names don't need to ask Gitlab for
+    their IDs. Unknown names are still asked to Gitlab and then remembered.
+    """
+    pass
+
+
+@index.command('refresh', short_help="Update the local name to ID index")
+@click.option('--kind', '-k', 'kinds', multiple=True, type=click.Choice(list(index_kinds)), help="Only refresh this kind of element (can be repeated)")
+@click.option('--full', is_flag=True, help="List every element again instead of only the changed ones")
+@click.option('--url', help="URL directing to Gitlab")
+@click.option('--token', help="Private token to access Gitlab")
+def indexCommandRefresh(kinds, full, url, token):
+    """Add the users, groups & projects created or changed since the last refresh to the index.
+
+    Groups are always listed completely, as Gitlab can't filter them by date.
+    Users are only listed when created since the last refresh, and projects
+    when active since then, so renamed ones may keep their old name until a
+    --full refresh. Use --full once in a while to also forget the deleted
+    elements. Names found in the index are always checked against Gitlab
+    before being used, so a stale name is looked up again instead of
+    pointing at the wrong element.
+    """
+    gl = common.performConnection(url, token)
+
+    for kind in kinds or index_kinds:
+        started = time.monotonic()
+        try:
+            amount = refreshIndex(gl, kind, full)
+        except Exception as e:
+            raise click.ClickException(e)
+        common.clickOutputMessage('OK', 'green', str(amount) + ' ' + kind + 's indexed (' + format(time.monotonic() - started, '.2f') + 's)')
@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+
+import click,csv,json
+from urllib.parse import quote
+from click_help_colors import HelpColorsGroup, HelpColorsCommand
+from . import common,commands
+
+access_levels = {'minimal': 5, 'guest': 10, 'planner': 15, 'reporter': 20, 'developer': 30, 'maintainer': 40, 'owner': 50}
+
+
+def parseAccessLevel(value): # Access levels can be written as numbers or as their role name
+    value = str(value).strip().lower()
+    if value.isdigit():
+        return int(value)
+    elif value in access_levels:
+        return access_levels[value]
+    else:
+        raise click.ClickException('Unknown access level <' + value + '>, use a number or one of: ' + ', '.join(access_levels))
+
+
+def readMembersFile(members_file): # Desired members as a {username: access_level} dictionary
+    content = members_file.read()
+    stripped = content.lstrip()
+
+    if members_file.name.endswith(('.yml', '.yaml', '.json')) or stripped.startswith(('[', '{', '- ')):
+        if members_file.name.endswith('.json') or stripped.startswith(('[', '{')):
+            members = json.loads(content)
+        else:
+            try:
+                import yaml
+            except ImportError:
+                raise click.ClickException('YAML members files need PyYAML installed (pip3 install pyyaml)')
+            members = yaml.safe_load(content) or {}
+
+        if isinstance(members, list): # [{username: ..., access_level: ...}, ...]
+            members = {member['username']: member['access_level'] for member in members}
+    else: # username,access_level per line, with an optional header
+        members = {}
+        for row in csv.reader(line for line in content.splitlines() if line.strip() and not line.strip().startswith('#')):
+            if row[0].strip() == 'username':
+                continue
+            members[row[0].strip()] = row[1] if len(row) > 1 else 'developer'
+
+    return {str(username).strip().lower(): parseAccessLevel(level) for username, level in members.items()} # Gitlab usernames are case insensitive
+
+
+def membersManager(gl, group, project): # The members of a group or of a project, without fetching the element itself
+    if group:
+        return gl.groups.get(group, lazy=True).members, '/groups/' + quote(group, safe='') + '/members'
+    else:
+        return gl.projects.get(project, lazy=True).members, '/projects/' + quote(project, safe='') + '/members'
+
+
+@click.group(cls=HelpColorsGroup, help_headers_color='yellow', help_options_color='green', short_help=commands.shortHelp('members'))
+def members():
+    """Manage the members of groups & projects.
+
+    Members are described by username and access level, which can be a
+    number or a role name (guest, reporter, developer, maintainer, owner).
+    """
+    pass
+
+
+@members.command('sync', cls=HelpColorsCommand, help_headers_color='yellow', help_options_color='green', short_help='Make the members of a group or project match a list')
+@click.option('--group', '-g', help="Group whose members are synchronized")
+@click.option('--project-name', '-p', help="Project whose members are synchronized. Must be <group>/<project_path>")
+@click.option('--keep-extra', is_flag=True, help="Do not remove the members missing from the list")
+@click.option('--dry-run', is_flag=True, help="Only show the changes, without applying them")
+@click.option('--parallel', type=click.IntRange(1, 32), default=8, help="Amount of requests sent concurrently")
+@click.option('--auto-confirm', '--yes', is_flag=True, help="Apply the changes without asking for confirmation")
+@click.option('--url', help="URL directing to Gitlab")
+@click.option('--token', help="Private token to access Gitlab")
+@click.argument('members_file', type=click.File('r'))
+@click.pass_context
+def sync(ctx, members_file, group, project_name, keep_extra, dry_run, parallel, auto_confirm, url, token):
+    """Add, update & remove direct members so they match MEMBERS_FILE.
+
+    \b
+    MEMBERS_FILE is either a CSV file:
+        username,access_level
+        jdoe,developer
+        asmith,40
+    or a YAML/JSON mapping (or list) of usernames and access levels.
+
+    Only the needed additions, access level changes & removals are sent.
+    """
+    if (group is None) == (project_name is None):
+        common.clickOutputMessage('ERROR', 'red', 'Define either a --group or a --project-name.')
+        return 1
+    elif project_name and not common.validateProjectName(project_name):
+        return 1
+
+    desired_members = readMembersFile(members_file)
+    gl = common.performConnection(url, token)
+    manager, members_path = membersManager(gl, group, project_name)
+
+    common.clickOutputHeader('Updating', 'Members', group or project_name)
+    try:
+        current_members = {member['username'].lower(): member for member in gl.http_list(members_path, iterator=True, per_page=100)}
+        user_ids = common.resolveUsernames(gl, [username for username in desired_members if username not in current_members], parallel)
+    except Exception as e:
+        raise click.ClickException(e)
+
+    operations = []
+    failures = {}
+    for username, access_level in desired_members.items():
+        if username in current_members:
+            if current_members[username]['access_level'] != access_level:
+                operations.append(('update', username, current_members[username]['id'], access_level))
+        elif username in user_ids:
+            operations.append(('add', username, user_ids[username], access_level))
+        else:
+            failures[username] = 'User does not exist'
+    if not keep_extra:
+        operations.extend(('remove', username, member['id'], member['access_level']) for username, member in current_members.items() if username not in desired_members)
+
+    print('--------------------------------------------------------------------------------------')
+    for action, username, user_id, access_level in operations:
+        if action == 'update':
+            common.clickOutputMessage('UPDATE', 'yellow', username + ': ' + click.style(str(current_members[username]['access_level']), fg='red') + ' --> ' + click.style(str(access_level), fg='yellow'))
+        elif action == 'add':
+            common.clickOutputMessage('ADD', 'green', username + ': ' + click.style(str(access_level), fg='yellow'))
+        else:
+            common.clickOutputMessage('REMOVE', 'red', username)
+    for username, error in failures.items():
+        common.clickOutputMessage('FAILED', 'red', username + ': ' + error)
+
+    print('--------------------------------------------------------------------------------------')
+    unchanged = sum(1 for username, access_level in desired_members.items() if username in current_members and current_members[username]['access_level'] == access_level)
+    common.clickOutputMessage('PLAN', 'yellow', str(len(operations)) + ' changes, ' + str(unchanged) + ' members already in place, ' + str(len(failures)) + ' failed')
+
+    if operations and not dry_run:
+        print('--------------------------------------------------------------------------------------')
+        if not common.askForConfirmation(auto_confirm, ' >>> Do you want to apply these changes? (yes/no): ', 'You decided not to change the members'):
+            return 1
+
+        def applyOperation(operation):
+            action, username, user_id, access_level = operation
+            if action == 'add':
+                manager.create({'user_id': user_id, 'access_level': access_level})
+            elif action == 'update':
+                manager.update(user_id, {'access_level': access_level})
+            else:
+                manager.delete(user_id)
+
+        failures.update(common.runParallelOperations(operations, applyOperation, parallel, label=lambda operation: operation[0] + ' ' + operation[1]))
+
+    if failures:
+        ctx.exit(1)
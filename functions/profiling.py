@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+
+import click,os,sys,time,threading
+from . import common
+
+profiling_modes = ('cpu', 'alloc')
+hot_spots_shown = 15
+allocation_frames = 32
+
+
+def profilePath(mode): # Written in the current directory, one file per run
+    return os.path.abspath('glabctl-' + mode + '-' + time.strftime('%Y%m%d-%H%M%S') + ('.pstats' if mode == 'cpu' else '.collapsed'))
+
+
+def startProfiling(mode): # Returns the function stopping the profiler, writing its file & printing the hot spots
+    if mode == 'cpu':
+        return startCpuProfiling()
+    else:
+        return startAllocationProfiling()
+
+
+def startCpuProfiling():
+    import cProfile
+
+    profilers = [cProfile.Profile()]
+    if sys.version_info < (3, 12): # Older profilers only see the thread enabling them, so every worker thread gets its own
+        def profileThread(*args):
+            sys.setprofile(None)
+            profiler = cProfile.Profile()
+            profilers.append(profiler)
+            profiler.enable()
+        threading.setprofile(profileThread)
+    profilers[0].enable()
+
+    def stopCpuProfiling():
+        import pstats
+
+        profilers[0].disable()
+        threading.setprofile(None)
+        statistics = pstats.Stats(*profilers)
+        profile_file = profilePath('cpu')
+        statistics.dump_stats(profile_file)
+
+        functions = sorted(statistics.stats.items(), key=lambda item: item[1][2], reverse=True)
+        common.outputFlush()
+        click.echo(click.style('[PROFILE]', fg='cyan') + ' ' + format(statistics.total_tt, '.2f') + 's of CPU profiled, written to <'
+                   + click.style(profile_file, fg='yellow') + '>. Top functions by own time:', err=True)
+        for (filename, line, name), (primitive_calls, calls, own_time, cumulative_time, callers) in functions[:hot_spots_shown]:
+            location = name if filename == '~' else os.path.basename(filename) + ':' + str(line) + '(' + name + ')'
+            click.echo('   ' + format(own_time, '8.3f') + 's own ' + format(cumulative_time, '8.3f') + 's total ' + str(calls).rjust(8) + ' calls  ' + location, err=True)
+
+    return stopCpuProfiling
+
+
+def startAllocationProfiling():
+    import tracemalloc
+
+    tracemalloc.start(allocation_frames)
+
+    def stopAllocationProfiling():
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')])
+        current_size, peak_size = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profile_file = profilePath('alloc')
+        with open(profile_file, 'w') as collapsed: # One 'outermost;...;innermost bytes' line per stack, as read by flamegraph.pl & speedscope
+            for statistic in snapshot.statistics('traceback'):
+                frames = ';'.join(os.path.basename(frame.filename) + ':' + str(frame.lineno) for frame in statistic.traceback)
+                collapsed.write(frames + ' ' + str(statistic.size) + '\n')
+
+        common.outputFlush()
+        click.echo(click.style('[PROFILE]', fg='cyan') + ' ' + common.formatBytes(peak_size) + ' allocated at the peak, ' + common.formatBytes(current_size)
+                   + ' still allocated at the end, written to <' + click.style(profile_file, fg='yellow') + '>. Top lines by memory still allocated:', err=True)
+        for statistic in snapshot.statistics('lineno')[:hot_spots_shown]:
+            frame = statistic.traceback[0]
+            click.echo('   ' + common.formatBytes(statistic.size).rjust(9) + ' ' + str(statistic.count).rjust(8) + ' blocks  '
+                       + os.path.basename(frame.filename) + ':' + str(frame.lineno), err=True)
+
+    return stopAllocationProfiling
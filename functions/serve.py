@@ -0,0 +1,209 @@
+#!/usr/bin/python3
+
+import click,os,io,sys,json,signal,socket,struct,threading,traceback
+from click_help_colors import HelpColorsCommand
+from . import common,cache,commands
+
+forwarded_variables = ('GLABCTL_URL', 'GLABCTL_TOKEN', 'GLABCTL_NO_CACHE')
+request_lock = threading.Lock()
+
+# Every message is a frame: one byte telling its kind, four bytes of length and the payload.
+#   client -> daemon: 'q' the JSON request, 'i' stdin bytes answering a read
+#   daemon -> client: 'o' stdout bytes, 'e' stderr bytes, 'i' a stdin read of up to N bytes, 'x' the exit code
+frame_header = struct.Struct('!cI')
+
+
+def socketPath():
+    return os.environ.get('GLABCTL_SOCKET') or os.path.join(cache.cache_directory, 'glabctl.sock')
+
+
+def sendFrame(connection, kind, payload):
+    connection.sendall(frame_header.pack(kind, len(payload)) + payload)
+
+
+def receiveExactly(connection, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise EOFError('The other side closed the connection')
+        data.extend(chunk)
+    return bytes(data)
+
+
+def receiveFrame(connection):
+    kind, size = frame_header.unpack(receiveExactly(connection, frame_header.size))
+    return kind, receiveExactly(connection, size)
+
+
+def forwardCommand(argv): # Thin client: runs argv in the daemon and returns its exit code, or None when no daemon is listening
+    if (argv and argv[0] == 'serve') or os.environ.get('GLABCTL_NO_DAEMON') or not os.path.exists(socketPath()):
+        return None
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socketPath())
+    except OSError: # Stale socket left behind, run in-process
+        connection.close()
+        return None
+
+    request = {'argv': argv,
+               'prog_name': os.path.basename(sys.argv[0]),
+               'cwd': os.getcwd(),
+               'environment': {name: os.environ[name] for name in forwarded_variables if name in os.environ},
+               'stdin_tty': sys.stdin.isatty(),
+               'stdout_tty': sys.stdout.isatty(),
+               'stderr_tty': sys.stderr.isatty()}
+
+    with connection:
+        sendFrame(connection, b'q', json.dumps(request).encode('utf-8'))
+        while True:
+            kind, payload = receiveFrame(connection)
+            if kind == b'o':
+                sys.stdout.buffer.write(payload)
+                sys.stdout.buffer.flush()
+            elif kind == b'e':
+                sys.stderr.buffer.write(payload)
+                sys.stderr.buffer.flush()
+            elif kind == b'i':
+                sendFrame(connection, b'i', sys.stdin.buffer.read1(int(payload)))
+            elif kind == b'x':
+                return int(payload)
+
+
+class ClientStream(io.RawIOBase): # A stdout/stderr/stdin of the daemon, backed by the client connection
+    def __init__(self, connection, kind, tty):
+        self.connection = connection
+        self.kind = kind
+        self.tty = tty
+
+    def isatty(self):
+        return self.tty
+
+    def writable(self):
+        return self.kind != b'i'
+
+    def readable(self):
+        return self.kind == b'i'
+
+    def write(self, data):
+        sendFrame(self.connection, self.kind, bytes(data))
+        return len(data)
+
+    def readinto(self, buffer): # Ask the client for its stdin, only when a command actually reads it
+        sendFrame(self.connection, b'i', str(len(buffer)).encode('ascii'))
+        kind, payload = receiveFrame(self.connection)
+        buffer[:len(payload)] = payload
+        return len(payload)
+
+
+def runRequest(root_command, request): # Runs one command exactly like the standalone CLI, returning the exit code it would have
+    try:
+        root_command.main(args=request['argv'], prog_name=request['prog_name'], standalone_mode=True)
+        return 0
+    except SystemExit as e: # Standalone click always ends with sys.exit(), after showing errors & 'Aborted!' itself
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        click.echo(e.code, err=True)
+        return 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+
+def handleConnection(root_command, connection): # One request per connection, requests are run one at a time
+    with connection:
+        kind, payload = receiveFrame(connection)
+        request = json.loads(payload)
+
+        with request_lock:
+            saved_streams = (sys.stdin, sys.stdout, sys.stderr)
+            saved_argv = sys.argv
+            saved_directory = os.getcwd()
+            saved_environment = {name: os.environ.get(name) for name in forwarded_variables}
+            try:
+                sys.stdout = io.TextIOWrapper(ClientStream(connection, b'o', request['stdout_tty']), encoding='utf-8', write_through=True)
+                sys.stderr = io.TextIOWrapper(ClientStream(connection, b'e', request['stderr_tty']), encoding='utf-8', write_through=True)
+                sys.stdin = io.TextIOWrapper(io.BufferedReader(ClientStream(connection, b'i', request['stdin_tty'])), encoding='utf-8')
+                for name in forwarded_variables:
+                    os.environ.pop(name, None)
+                os.environ.update(request['environment'])
+                os.chdir(request['cwd'])
+                sys.argv = [request['prog_name']] + request['argv']
+                common.outputReset()
+                common.resetHttpStatistics()
+                cache.configureCache(True, False) # --no-cache & --refresh only last for the command asking for them
+
+                exit_code = runRequest(root_command, request)
+                common.outputReset()
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                sys.stdin, sys.stdout, sys.stderr = saved_streams
+                sys.argv = saved_argv
+                os.chdir(saved_directory)
+                for name, value in saved_environment.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+
+        sendFrame(connection, b'x', str(exit_code).encode('ascii'))
+
+
+@click.command('serve', cls=HelpColorsCommand, help_headers_color='yellow', help_options_color='green', short_help=commands.shortHelp('serve'))
+@click.option('--socket', 'socket_file', type=click.Path(dir_okay=False), help="Unix socket to listen on, defaults to GLABCTL_SOCKET or ~/.cache/glabctl/glabctl.sock")
+@click.pass_context
+def serve(ctx, socket_file):
+    """Run glabctl as a daemon listening on a Unix socket.
+
+    While it runs, every 'glabctl' call is forwarded to it, reusing its loaded
+    modules, Gitlab connections & caches, so a command costs little more than
+    its own API requests. Without a daemon, glabctl simply runs in-process.
+
+    Stop it with Ctrl+C. Set GLABCTL_NO_DAEMON=1 to bypass it for a call.
+    """
+    socket_file = socket_file or socketPath()
+    root_command = ctx.find_root().command
+
+    if os.path.exists(socket_file):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_file)
+            raise click.ClickException('A daemon is already listening on ' + socket_file)
+        except OSError: # Left behind by a daemon which did not stop cleanly
+            os.remove(socket_file)
+        finally:
+            probe.close()
+
+    os.makedirs(os.path.dirname(os.path.abspath(socket_file)), mode=0o700, exist_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    previous_umask = os.umask(0o177) # Only this user can talk to the daemon, it acts with their Gitlab token
+    try:
+        server.bind(socket_file)
+    finally:
+        os.umask(previous_umask)
+    server.listen(16)
+
+    for subcommand in root_command.list_commands(ctx): # Load the whole command tree once
+        root_command.get_command(ctx, subcommand)
+
+    signal.signal(signal.SIGTERM, signal.default_int_handler) # Stopped by kill like by Ctrl+C, removing the socket
+    common.clickOutputMessage('LISTENING', 'green', 'Serving glabctl commands on <' + click.style(socket_file, fg='yellow') + '>')
+    try:
+        while True:
+            connection, address = server.accept()
+            threading.Thread(target=serveConnection, args=(root_command, connection), daemon=True).start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.remove(socket_file)
+        common.clickOutputMessage('STOPPED', 'yellow', 'The daemon is not serving commands anymore')
+
+
+def serveConnection(root_command, connection):
+    try:
+        handleConnection(root_command, connection)
+    except (OSError, EOFError, ValueError): # The client went away, nothing left to answer
+        pass
@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+
+import time,requests
+from . import common,cache
+
+
+class GitlabSession(requests.Session): # Keep-alive session answering repeated GET requests from the local cache
+    def send(self, request, **kwargs):
+        if not common.http_recording['enabled']:
+            return self.sendThroughCache(request, **kwargs)[0]
+
+        started = time.perf_counter()
+        response, source = self.sendThroughCache(request, **kwargs)
+        latency = time.perf_counter() - started
+        if source == 'network' and not kwargs.get('stream'): # Streamed bodies are only read later, by their caller
+            received = len(response.content)
+        else:
+            received = 0 if source != 'network' else int(response.headers.get('Content-Length') or 0)
+        common.recordHttpRequest(request.method, request.url, 304 if source == 'revalidated' else response.status_code, latency, received,
+                                 response.headers, source, None if source == 'cache' else response.elapsed.total_seconds())
+        return response
+
+    def sendThroughCache(self, request, **kwargs): # Returns the response and where it came from: network, cache or revalidated
+        if not cache.isCacheable(request, kwargs):
+            common.countHttpRequest('requests')
+            response = super().send(request, **kwargs)
+            if request.method in ('POST', 'PUT', 'PATCH', 'DELETE') and response.ok:
+                cache.invalidateIdentity(request)
+            return response, 'network'
+
+        cached = cache.loadEntry(request)
+        if cached:
+            metadata, body = cached
+            if cache.isFresh(metadata) and request.headers.get('Cache-Control') != 'no-cache': # no-cache asks for a revalidation, like in browsers
+                cache.touchEntry(request)
+                common.countHttpRequest('cached')
+                return cache.buildResponse(request, metadata, body), 'cache'
+            elif metadata['etag']: # A 304 answer costs a round trip, but no payload
+                request.headers['If-None-Match'] = metadata['etag']
+
+        common.countHttpRequest('requests')
+        response = super().send(request, **kwargs)
+
+        if response.status_code == 304 and cached:
+            cache.refreshEntry(request, metadata, body)
+            revalidated = cache.buildResponse(request, metadata, body)
+            revalidated.elapsed = response.elapsed
+            return revalidated, 'revalidated'
+        elif response.status_code == 200:
+            cache.storeEntry(request, response, response.content)
+
+        return response, 'network'
+
+
+def createSession(): # Keep-alive HTTP session with room for every concurrent worker
+    session = GitlabSession()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=common.connection_pool_size, pool_block=True)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.hooks['response'].append(common.recordRateLimit)
+    return session
@@ -0,0 +1,164 @@
+#!/usr/bin/python3
+
+import click,os,json,time,sqlite3,datetime,collections
+from concurrent import futures
+from click_help_colors import HelpColorsCommand
+from . import common,cache,commands
+
+snapshot_tables = { # Kind: key column, every table also keeps the full element as JSON
+    'projects': 'path_with_namespace',
+    'groups': 'full_path',
+    'users': 'username',
+}
+
+
+def snapshotPath(url, token): # One snapshot per Gitlab host & token, found again without connecting to Gitlab
+    return os.path.join(cache.cache_directory, 'snapshot-' + cache.identityHash(common.defineGitlabHost(url) or '', common.defineGitlabToken(token)) + '.sqlite')
+
+
+def openSnapshot(snapshot_file):
+    os.makedirs(os.path.dirname(os.path.abspath(snapshot_file)), mode=0o700, exist_ok=True)
+    connection = sqlite3.connect(snapshot_file)
+    for kind, key_column in snapshot_tables.items():
+        connection.execute('CREATE TABLE IF NOT EXISTS ' + kind + ' (id INTEGER PRIMARY KEY, ' + key_column + ' TEXT NOT NULL, data TEXT NOT NULL)')
+    connection.execute('CREATE TABLE IF NOT EXISTS branches (project_id INTEGER NOT NULL, project TEXT NOT NULL, name TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (project_id, name))')
+    connection.execute('CREATE TABLE IF NOT EXISTS refreshes (kind TEXT PRIMARY KEY, refreshed_at TEXT NOT NULL)')
+    return connection
+
+
+def storeElements(connection, kind, elements):
+    key_column = snapshot_tables[kind]
+    connection.executemany('INSERT OR REPLACE INTO ' + kind + ' (id, ' + key_column + ', data) VALUES (?, ?, ?)',
+                           [(element['id'], element[key_column], json.dumps(element)) for element in elements])
+
+
+def storeBranches(connection, project, branches): # A project's branches are always replaced as a whole
+    connection.execute('DELETE FROM branches WHERE project_id = ?', (project['id'],))
+    connection.executemany('INSERT INTO branches (project_id, project, name, data) VALUES (?, ?, ?, ?)',
+                           [(project['id'], project['path_with_namespace'], branch['name'], json.dumps(branch)) for branch in branches])
+
+
+def storeBranchListing(connection, listing, project): # Waits for one project's branches and stores them, returning how many
+    try:
+        branches = listing.result()
+    except Exception as e: # Empty repositories or disabled repository features answer with errors
+        common.clickOutputMessage('WARNING', 'yellow', 'Could not read the branches of <' + project['path_with_namespace'] + '>: ' + str(e))
+        return 0
+    storeBranches(connection, project, branches)
+    return len(branches)
+
+
+def takeSnapshot(gl, connection, full, parallel): # Returns the amount of elements written per kind
+    row = connection.execute("SELECT refreshed_at FROM refreshes WHERE kind = 'projects'").fetchone()
+    project_filters = {'pagination': 'keyset', 'order_by': 'id', 'sort': 'asc'}
+    if row and not full: # Pushes, merges & settings changes all move last_activity_at
+        project_filters['last_activity_after'] = row[0]
+
+    refreshed_at = datetime.datetime.now(datetime.timezone.utc).isoformat() # Taken before listing, so nothing changed meanwhile is missed
+    written = {'projects': 0, 'groups': 0, 'users': 0, 'branches': 0}
+
+    with futures.ThreadPoolExecutor(max_workers=parallel) as executor:
+        # Groups & users can't be filtered by date, their listings are revalidated through the response cache ETags instead
+        listings = {kind: executor.submit(lambda path=path: list(gl.http_list(path, iterator=True, per_page=100)))
+                    for kind, path in (('groups', '/groups'), ('users', '/users'))}
+        branch_listings = collections.deque()
+
+        with connection:
+            if full:
+                for kind in list(snapshot_tables) + ['branches']:
+                    connection.execute('DELETE FROM ' + kind)
+
+            for project in gl.http_list('/projects', iterator=True, per_page=100, **project_filters): # Branches are requested while the next project pages arrive
+                storeElements(connection, 'projects', [project])
+                written['projects'] += 1
+                branch_listings.append((executor.submit(gl.http_list, '/projects/' + str(project['id']) + '/repository/branches', per_page=100, get_all=True), project))
+                if len(branch_listings) >= parallel * 2: # Bounded window so memory does not grow with the instance
+                    written['branches'] += storeBranchListing(connection, *branch_listings.popleft())
+
+            while branch_listings:
+                written['branches'] += storeBranchListing(connection, *branch_listings.popleft())
+
+            for kind, listing in listings.items():
+                elements = listing.result()
+                connection.execute('DELETE FROM ' + kind)
+                storeElements(connection, kind, elements)
+                written[kind] = len(elements)
+
+            connection.execute('INSERT OR REPLACE INTO refreshes (kind, refreshed_at) VALUES (?, ?)', ('projects', refreshed_at))
+
+    return written
+
+
+def matchesFilters(element, filters): # Same filters as the Gitlab listings, applied to the snapshot
+    for key, value in filters.items():
+        if key == 'search':
+            if not any(value.lower() in str(element.get(field) or '').lower() for field in ('name', 'path', 'username', 'email')):
+                return False
+        elif key == 'group':
+            if not (element.get('path_with_namespace') or element.get('project') or '').startswith(value.rstrip('/') + '/'):
+                return False
+        elif key == 'last_activity_after':
+            if (element.get('last_activity_at') or '') <= value:
+                return False
+        elif key in ('owned', 'membership'):
+            raise click.ClickException('--' + key + ' depends on the token permissions and can not be answered from a snapshot')
+        elif element.get(key) != value:
+            return False
+    return True
+
+
+def readSnapshot(url, token, kind, limit=0, **filters): # Elements of the snapshot as dictionaries, without any request to Gitlab
+    snapshot_file = snapshotPath(url, token)
+    if not os.path.exists(snapshot_file):
+        raise click.ClickException('There is no snapshot of this Gitlab yet, take one with: glabctl snapshot')
+
+    connection = sqlite3.connect(snapshot_file)
+    order_by = filters.pop('order_by', None) or 'id'
+    project = filters.pop('project', None)
+    if kind == 'branches':
+        rows = connection.execute('SELECT data, project FROM branches' + (' WHERE project = ?' if project else '') + ' ORDER BY project_id, name', (project,) if project else ())
+    else:
+        rows = connection.execute('SELECT data, NULL FROM ' + kind + ' ORDER BY id')
+
+    elements = []
+    for data, project_path in rows:
+        element = json.loads(data)
+        if project_path is not None and not project:
+            element['project'] = project_path
+        if matchesFilters(element, filters):
+            elements.append(element)
+
+    if order_by != 'id':
+        elements.sort(key=lambda element: str(element.get(order_by) or ''))
+    return elements[:limit] if limit else elements
+
+
+@click.command('snapshot', cls=HelpColorsCommand, help_headers_color='yellow', help_options_color='green', short_help=commands.shortHelp('snapshot'))
+@click.option('--full', is_flag=True, help="Fetch everything again instead of only what changed since the last snapshot")
+@click.option('--parallel', type=click.IntRange(1, 64), default=16, help="Amount of requests sent concurrently")
+@click.option('--url', help="URL directing to Gitlab")
+@click.option('--token', help="Private token to access Gitlab")
+def snapshot(full, parallel, url, token):
+    """Save every project, group, user & branch visible to your token in a local SQLite snapshot.
+
+    Later runs only fetch the projects (and their branches) with activity since the
+    previous snapshot. Gitlab can't list deleted projects, so they stay in the
+    snapshot until the next --full run, which replaces everything. Use
+    --from-snapshot in the 'get' subcommands to query it without any request to Gitlab.
+    """
+    gl = common.performConnection(url, token)
+    snapshot_file = snapshotPath(url, token)
+    started = time.monotonic()
+
+    common.clickOutputHeader('Creating', 'Snapshot', snapshot_file)
+    try:
+        connection = openSnapshot(snapshot_file)
+        written = takeSnapshot(gl, connection, full, parallel)
+        connection.close()
+    except click.ClickException:
+        raise
+    except Exception as e:
+        raise click.ClickException(e)
+
+    common.clickOutputMessage('OK', 'green', ', '.join(str(amount) + ' ' + kind for kind, amount in written.items())
+                              + ' written (' + format(time.monotonic() - started, '.2f') + 's)')
@@ -1,8 +1,9 @@
 #!/usr/bin/python3
 
-import gitlab,click,os
+import click,os
+from concurrent import futures
 from click_help_colors import HelpColorsGroup, HelpColorsCommand
-from . import common
+from . import common,index,commands
 
 
 def beautifullyDisplayChanges(changes_json, failures_json):
@@ -32,11 +33,36 @@ def beautifullyDisplayChanges(changes_json, failures_json):
     print('--------------------------------------------------------------------------------------')
 
 
+def runValidations(lookups): # Independent lookups are sent at once, so validating costs a single round trip
+    executor = futures.ThreadPoolExecutor(max_workers=max(len(lookups), 1))
+    validations = {key: executor.submit(lookup) for key, lookup in lookups.items()}
+    executor.shutdown(wait=False)
+    return validations
+
+
 def addToChanges(changes_json, key, old_value, new_value):
     changes_json[key] = { "before": old_value, "after": new_value }
     return changes_json
 
 
+boolean_keys = ('lfs_enabled', 'request_access_enabled', 'archived', 'container_registry_enabled', 'issues_enabled', 'merge_requests_enabled', 'wiki_enabled',
+                'jobs_enabled', 'snippets_enabled', 'shared_runners_enabled', 'public_jobs', 'can_create_group', 'external', 'protected') # Set by 'True'/'False' choices
+
+
+def typedValue(key, value): # Click choices arrive as 'True'/'False' strings, Gitlab expects booleans, a description saying 'True' stays a string
+    if key in boolean_keys and value in ('True', 'False'):
+        return value == 'True'
+    else:
+        return value
+
+
+def changesPayload(changes_json, excluded_keys=()): # Only the changed keys, with their new values, travel in the PUT request
+    return {key: typedValue(key, change['after']) for key, change in changes_json.items() if key not in excluded_keys}
+
+
+action_keys = ('archived', 'state', 'protected', 'parent_id') # Applied through their own endpoints, never part of the PUT
+
+
 def applyChanges(element, gl_object, changes_json, auto_confirm, failures_json):
     if changes_json:
         common.clickOutputMessage('NEW STATE', 'yellow', 'The ' + element + ' parameters are about to change.')
@@ -45,59 +71,78 @@ def applyChanges(element, gl_object, changes_json, auto_confirm, failures_json):
         if not common.askForConfirmation(auto_confirm, ' >>> Do you want to update the ' + element + '? (yes/no): ', 'You decided not to save the modifications'):
             return 1
 
-        if 'archived' in changes_json:
+        element_id = gl_object.get_id() # Read before any action, as they refresh the object with the server answer
+
+        archiving = changes_json.get('archived', {}).get('after') == 'True'
+        if 'archived' in changes_json and not archiving: # Unarchived first, an archived project refuses any other edit
             hideElement(gl_object, changes_json, auto_confirm, 'archived')
         elif 'state' in changes_json:
             hideElement(gl_object, changes_json, auto_confirm, 'state')
         if 'protected' in changes_json:
             hideElement(gl_object, changes_json, auto_confirm, 'protected')
 
-        if element != 'branch':
+        if 'parent_id' in changes_json:
+            gl_object.transfer(changes_json['parent_id']['after'])
+
+        payload = changesPayload(changes_json, action_keys)
+        if payload:
             print('--------------------------------------------------------------------------------------')
             common.clickOutputMessage('SAVING', 'yellow', 'Applying all defined changes')
-            gl_object.save()
+            gl_object.manager.update(element_id, payload)
             print('--------------------------------------------------------------------------------------')
+
+        if archiving: # Archived last, the project is read-only from then on
+            hideElement(gl_object, changes_json, auto_confirm, 'archived')
         
         common.clickOutputMessage('OK', 'green', 'Your changes have been applied correctly')
 
     else:
+        if failures_json: # Nothing left to apply, but the requested changes which can't be made are still reported
+            beautifullyDisplayChanges(changes_json, failures_json)
         common.clickOutputMessage('OK', 'green', 'The changes history is empty. There is nothing to change')
         return 1
 
 
+def protectBranch(branch, protected): # Protected branches have their own endpoint in the current API
+    project = branch.manager.gitlab.projects.get(branch.manager.parent_attrs['project_id'], lazy=True)
+    if protected:
+        project.protectedbranches.create({'name': branch.name})
+    else:
+        project.protectedbranches.delete(branch.name)
+
+
 def hideElement(gl_object, changes, auto_confirm, key):
-    if not auto_confirm:
-        print('--------------------------------------------------------------------------------------')
-        if changes[key]['after'] in ('True', 'blocked'):
-            if key == 'archived':
-                common.clickOutputMessage('ARCHIVING', 'yellow', 'Changes include archiving the project...')
-        
-                if common.askForConfirmation(auto_confirm, ' >>> Do you really want to archive this project? (yes/no): ', 'Project will not be archived', 'ARCHIVING CANCELLED'):
-                    gl_object.archive() 
-
-            elif key == 'state':
-                if common.askForConfirmation(auto_confirm, ' >>> Do you really want to block this user? (yes/no): ', 'User will remain unblocked in this system', 'BLOCK CANCELLED'):
-                    gl_object.block()
-
-            elif key == 'protected':
-                if common.askForConfirmation(auto_confirm, ' >>> Do you really want to protect this branch? (yes/no): ', 'Branch will remain unprotected in the defined project', 'BLOCK CANCELLED'):
-                    gl_object.protect()
-
-        else:
-            if key == 'archived':
-                if common.askForConfirmation(auto_confirm, ' >>> Do you really want to unarchive this project? (yes/no): ', 'Project will remain archived', 'UNARCHIVING CANCELLED'):
-                    gl_object.unarchive()
-
-            elif key == 'state':
-                if common.askForConfirmation(auto_confirm, ' >>> Do you really want to unblock this user? (yes/no): ',
-                                             'User will remain blocked in this system', 'UNBLOCK CANCELLED'):
-                    gl_object.unblock()
-            elif key == 'protected':
-                if common.askForConfirmation(auto_confirm, ' >>> Do you really want to unprotect this branch? (yes/no): ', 
-                                             'Branch will remain protected in the defined project', 'UNPROTECT CANCELLED'):
-                    gl_object.unprotect()
-
-@click.group(cls=HelpColorsGroup, help_headers_color='yellow', help_options_color='green')
+    print('--------------------------------------------------------------------------------------')
+    if changes[key]['after'] in ('True', 'blocked'):
+        if key == 'archived':
+            common.clickOutputMessage('ARCHIVING', 'yellow', 'Changes include archiving the project...')
+    
+            if common.askForConfirmation(auto_confirm, ' >>> Do you really want to archive this project? (yes/no): ', 'Project will not be archived', 'ARCHIVING CANCELLED'):
+                gl_object.archive() 
+
+        elif key == 'state':
+            if common.askForConfirmation(auto_confirm, ' >>> Do you really want to block this user? (yes/no): ', 'User will remain unblocked in this system', 'BLOCK CANCELLED'):
+                gl_object.block()
+
+        elif key == 'protected':
+            if common.askForConfirmation(auto_confirm, ' >>> Do you really want to protect this branch? (yes/no): ', 'Branch will remain unprotected in the defined project', 'BLOCK CANCELLED'):
+                protectBranch(gl_object, True)
+
+    else:
+        if key == 'archived':
+            if common.askForConfirmation(auto_confirm, ' >>> Do you really want to unarchive this project? (yes/no): ', 'Project will remain archived', 'UNARCHIVING CANCELLED'):
+                gl_object.unarchive()
+
+        elif key == 'state':
+            if common.askForConfirmation(auto_confirm, ' >>> Do you really want to unblock this user? (yes/no): ',
+                                         'User will remain blocked in this system', 'UNBLOCK CANCELLED'):
+                gl_object.unblock()
+        elif key == 'protected':
+            if common.askForConfirmation(auto_confirm, ' >>> Do you really want to unprotect this branch? (yes/no): ', 
+                                         'Branch will remain protected in the defined project', 'UNPROTECT CANCELLED'):
+                protectBranch(gl_object, False)
+
+@click.group(cls=HelpColorsGroup, help_headers_color='yellow', help_options_color='green', short_help=commands.shortHelp('update'))
 def update():
     """Update values from already existing objects on Gitlab.
 
@@ -114,7 +159,7 @@ def update():
 @click.option('--enable-lfs', type=click.Choice(['True', 'False']), help="Modify LFS status")
 @click.option('--default-branch', type=str, help="Edit default branch")
 @click.option('--access-request', type=click.Choice(['True', 'False']), help="Edit the Request Access option")
-@click.option('--owner', type=int, help="Change project's owner. Must be ID")
+@click.option('--owner', type=int, help="Project's owner ID. Gitlab can't change it through its API, a different owner is reported as a failure")
 @click.option('--visibility', type=click.Choice(['public', 'private', 'internal']), help="Change the project's visibility")
 @click.option('--archive', type=click.Choice(['True', 'False']), help="Archive the project")
 @click.option('--enable-c-reg', type=click.Choice(['True', 'False']), help="Enable/disable Container Registry for this project")
@@ -143,13 +188,20 @@ def updateCommandProject(project_name, name, path, sync, description, enable_lfs
     else:
         try:
             gl = common.performConnection(url, token)
-            project = gl.projects.get(project_name)
+            lookups = {'project': lambda: gl.projects.get(project_name)}
+            if default_branch != None:
+                lookups['default_branch'] = lambda: gl.projects.get(project_name, lazy=True).branches.get(default_branch)
+            if visibility != None:
+                lookups['group'] = lambda: gl.groups.get(project_name.split('/')[0])
+
+            validations = runValidations(lookups)
             changes = {}
             failures = {}
             failures_counter = 0
             
-            common.clickOutputHeader('Updating', 'Project', project.path_with_namespace)
+            common.clickOutputHeader('Updating', 'Project', project_name)
             common.clickOutputMessage('VALIDATING...', 'yellow', 'The process of checking your changes is being done.')
+            project = validations['project'].result()
             print('--------------------------------------------------------------------------------------')
 
             # Placeholder IF logic until a better process is developed.
@@ -170,17 +222,14 @@ def updateCommandProject(project_name, name, path, sync, description, enable_lfs
             
             if (description != None and project.description != description):
                 changes = addToChanges(changes, 'description', project.description, description)
-                project.description = description
 
             if (enable_lfs != None and enable_lfs != str(project.lfs_enabled)):
                 changes = addToChanges(changes, 'lfs_enabled', project.lfs_enabled, enable_lfs)
-                project.lfs_enabled = enable_lfs
 
             if (default_branch != None and project.default_branch != default_branch):
                 try:
-                    project.branches.get(default_branch) # Validate the branch exists
-                    changes = addToChanges(changes, 'default-branch', project.default_branch, default_branch)
-                    project.default_branch = default_branch
+                    validations['default_branch'].result() # Validate the branch exists
+                    changes = addToChanges(changes, 'default_branch', project.default_branch, default_branch)
 
                 except Exception:
                     failures[failures_counter] = "Could not edit default-branch value. Branch <" + click.style(default_branch, fg='yellow') + "> might not exist"
@@ -189,64 +238,46 @@ def updateCommandProject(project_name, name, path, sync, description, enable_lfs
 
             if (access_request != None and access_request != str(project.request_access_enabled)):
                 changes = addToChanges(changes, 'request_access_enabled', project.request_access_enabled, access_request)
-                project.request_access_enabled = access_request
-
-            if owner != None:
-                try:
-                    gl.users.get(owner) # Validate the user ID exists
 
-                    if (project.owner['id'] != str(owner)):
-                        changes = addToChanges(changes, 'owner', project.owner['id'], owner)
-                        project.owner['id'] = owner
-
-                except Exception:
-                    failures[failures_counter] = "Could not edit owner value. Owner ID <" + click.style(owner, fg='yellow') + "> might not exist or project doesn't have an <owner> field."
+            if owner != None: # Gitlab has no endpoint editing it, reported instead of silently ignored
+                owner_id = (getattr(project, 'owner', None) or {}).get('id')
+                if owner_id != owner:
+                    failures[failures_counter] = "Could not edit owner value. Gitlab can't change a project's owner <" + click.style(str(owner_id), fg='yellow') + "> through its API, transfer the project to the user's namespace instead."
                     failures_counter += 1
-                    pass
 
             if visibility != None:
-                if (gl.groups.get(project_name.split('/')[0]).visibility in ["private", "internal"]):
+                if (validations['group'].result().visibility in ["private", "internal"]):
                     failures[failures_counter] = "Could not update visibility, seems the group's and the defined visibility are uncompatible."
                     failures_counter += 1
                 else: 
                     changes = addToChanges(changes, 'visibility', project.visibility, visibility)
-                    project.visibility = visibility
 
-            if (archive != None and archive != str(project.archived)): # Doesn't work, although it detects it.
+            if (archive != None and archive != str(project.archived)):
                 changes = addToChanges(changes, 'archived', project.archived, archive)
-                project.archived = bool(archive)
 
             if (enable_c_reg != None and enable_c_reg != str(project.container_registry_enabled)):
                 changes = addToChanges(changes, 'container_registry_enabled', project.container_registry_enabled, enable_c_reg)
-                project.container_registry_enabled = enable_c_reg
 
             if (enable_issues != None and enable_issues != str(project.issues_enabled)): 
                 changes = addToChanges(changes, 'issues_enabled', project.issues_enabled, enable_issues) 
-                project.issues_enabled = enable_issues
 
             if (enable_merge_requests != None and enable_merge_requests != str(project.merge_requests_enabled)):
                 changes = addToChanges(changes, 'merge_requests_enabled', project.merge_requests_enabled, enable_merge_requests)
-                project.merge_requests_enabled = enable_merge_requests
 
             if (enable_wiki != None and enable_wiki != str(project.wiki_enabled)):
                 changes = addToChanges(changes, 'wiki_enabled', project.wiki_enabled, enable_wiki)
-                project.wiki_enabled = enable_wiki
 
             if (enable_jobs != None and enable_jobs != str(project.jobs_enabled)):
                 changes = addToChanges(changes, 'jobs_enabled', project.jobs_enabled, enable_jobs)
-                project.jobs_enabled = enable_jobs
 
             if (enable_snippets != None and enable_snippets != str(project.snippets_enabled)):
                 changes = addToChanges(changes, 'snippets_enabled', project.snippets_enabled, enable_snippets)
-                project.snippets_enabled = enable_snippets
 
-            if (enable_shared_runners != None and enable_shared_runners != str(shared_runners_enabled)):
+            if (enable_shared_runners != None and enable_shared_runners != str(project.shared_runners_enabled)):
                 changes = addToChanges(changes, 'shared_runners_enabled', project.shared_runners_enabled, enable_shared_runners)
-                project.shared_runners_enabled = enable_shared_runners
 
-            if (public_jobs != None and public_jobs != str(public_jobs)):
+            if (public_jobs != None and public_jobs != str(project.public_jobs)):
                 changes = addToChanges(changes, 'public_jobs', project.public_jobs, public_jobs)
-                project.public_jobs = public_jobs
 
             applyChanges('project', project, changes, auto_confirm, failures)
 
@@ -296,26 +327,18 @@ def updateCommandGroup(group_name, name, path, sync, description, enable_lfs, ac
 
         if description != None and description != group.description:
             changes = addToChanges(changes, 'description', group.description, description)
-            group.description = description
 
-        if enable_lfs != None and enable_lfs != group.lfs_enabled:
+        if enable_lfs != None and enable_lfs != str(group.lfs_enabled):
             changes = addToChanges(changes, 'lfs_enabled', group.lfs_enabled, enable_lfs)
-            group.lfs_enabled = enable_lfs
 
-        if access_request != None and access_request != group.request_access_enabled:
+        if access_request != None and access_request != str(group.request_access_enabled):
             changes = addToChanges(changes, 'request_access_enabled', group.request_access_enabled, access_request)
-            group.request_access_enabled = access_request
 
         if visibility != None and visibility != group.visibility:
             changes = addToChanges(changes, 'visibility', group.visibility, visibility)
-            group.visibility = visibility
 
         if parent_id != None and parent_id != group.parent_id:
-            changes = addToChanges(changes, 'parent_id', group.parent_id, parent_id)
-            parent_group_name = gl.groups.get(parent_id).name
-            print(parent_group_name)
-            group.full_path = str(parent_group_name) + '/' + str(group.name)
-            print(group.full_path)
+            changes = addToChanges(changes, 'parent_id', group.parent_id, parent_id) # Moved with a group transfer when applied
 
         applyChanges('group', group, changes, auto_confirm, failures)
 
@@ -342,7 +365,11 @@ def updateCommandUser(username, name, projects_limit, can_create_group, external
         gl = common.performConnection(url, token)
         changes = {}
         failures = {}
-        user = gl.users.list(username=username)[0]
+        user_id = index.lookupId(gl, 'user', username, revalidate=True)
+        if user_id is None:
+            common.clickOutputMessage('ERROR', 'red', 'Could not find user <' + click.style(username, fg='yellow') + '> in Gitlab...')
+            return 1
+        user = gl.users.get(user_id)
         
         common.clickOutputHeader('Updating', 'User', user.username)
         common.clickOutputMessage('VALIDATING...', 'yellow', 'The process of checking your changes is being done.')
@@ -353,24 +380,19 @@ def updateCommandUser(username, name, projects_limit, can_create_group, external
             user.name = name
 
         if projects_limit != None and str(projects_limit) != str(user.projects_limit):
-            changes = addToChanges(changes, 'project_limit', user.projects_limit, projects_limit)
-            user.projects_limit = projects_limit
+            changes = addToChanges(changes, 'projects_limit', user.projects_limit, projects_limit)
 
         if can_create_group != None and str(can_create_group) != str(user.can_create_group):
             changes = addToChanges(changes, 'can_create_group', user.can_create_group, can_create_group)
-            user.can_create_group = can_create_group
 
         if external != None and str(external) != str(user.external):
             changes = addToChanges(changes, 'external', user.external, external)
-            user.external = external
 
         if blocked != None and str(blocked) == "True" and user.state != 'blocked':
             changes = addToChanges(changes, 'state', user.state, 'blocked')
-            user.state = 'blocked'
 
         elif blocked != None and str(blocked) == "False" and user.state == 'blocked':
             changes = addToChanges(changes, 'state', user.state, 'active')
-            user.state = 'active'
 
         applyChanges('user', user, changes, auto_confirm, failures)
 
@@ -1,13 +1,56 @@
 #!/usr/bin/python3
 
 
-import click,os
-from functions import get,create,delete,update
+import click,importlib,sys
+from functions import cache,commands,common,serve
 from click_help_colors import HelpColorsGroup
 
 
-@click.group(cls=HelpColorsGroup, help_headers_color='yellow', help_options_color='green')
-def main(): # Main help & commands
+class LazyGroup(HelpColorsGroup): # Subcommand modules (and python-gitlab with them) are only imported when a command needs them
+    lazy_subcommands = commands.subcommands
+
+    def parse_args(self, ctx, args): # A bare --profile is followed by the command name, not by a profiling mode
+        args = list(args)
+        for position, arg in enumerate(args):
+            if arg in self.lazy_subcommands: # Anything after the command name belongs to the command
+                break
+            elif arg == '--profile' and args[position + 1:position + 2] not in (['cpu'], ['alloc']):
+                args[position] = '--profile=cpu'
+        return super().parse_args(ctx, args)
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_subcommands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_subcommands and cmd_name not in self.commands:
+            module = importlib.import_module(self.lazy_subcommands[cmd_name][0])
+            self.add_command(getattr(module, cmd_name))
+        return super().get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx, formatter): # Help listing built from the stored short help, without importing anything
+        rows = []
+        for cmd_name in self.list_commands(ctx):
+            if cmd_name in self.commands:
+                if not self.commands[cmd_name].hidden:
+                    rows.append((cmd_name, self.commands[cmd_name].get_short_help_str(formatter.width)))
+            else:
+                rows.append((cmd_name, self.lazy_subcommands[cmd_name][1]))
+
+        if rows:
+            with formatter.section('Commands'):
+                formatter.write_dl(rows)
+
+
+@click.group(cls=LazyGroup, help_headers_color='yellow', help_options_color='green')
+@click.option('--no-cache', is_flag=True, envvar='GLABCTL_NO_CACHE', help="Neither read nor write the local response cache")
+@click.option('--refresh', is_flag=True, help="Revalidate every cached response with Gitlab")
+@click.option('--debug-http', is_flag=True, help="Print how many HTTP requests the command made")
+@click.option('--trace', is_flag=True, help="Print every HTTP request to stderr as it completes")
+@click.option('--stats', is_flag=True, help="Print a summary of the HTTP requests (latency histogram, bytes, retries) at the end")
+@click.option('--stats-json', type=click.Path(dir_okay=False, writable=True), help="Write every HTTP request & their summary to this JSON file")
+@click.option('--profile', type=click.Choice(['cpu', 'alloc']), is_flag=False, flag_value='cpu', help="Profile the command's CPU time (default) or memory allocations, writing a pstats or collapsed stacks file")
+@click.pass_context
+def main(ctx, no_cache, refresh, debug_http, trace, stats, stats_json, profile): # Main help & commands
     """A command-line tool to control Gitlab from its API.
 
     \b
@@ -18,16 +61,28 @@ def main(): # Main help & commands
 
     It might be useful for automated processes of a CI/CD pipeline
     or as a workaround for Tools which can't control Gitlab natively.
-    """
-    pass
 
-
-# Build Click command
-main.add_command(get.get)
-main.add_command(create.create)
-main.add_command(delete.delete)
-main.add_command(update.update)
+    Responses are cached under ~/.cache/glabctl and revalidated with Gitlab
+    through their ETag, use --no-cache or --refresh to bypass it.
+    """
+    if no_cache or refresh: # Operations run by batch keep the cache settings of the main command
+        cache.configureCache(not no_cache, refresh)
+    if debug_http:
+        ctx.call_on_close(common.printHttpStatistics)
+    if trace or stats or stats_json: # Operations run by batch don't stop a recording started by the main command
+        common.startHttpRecording(trace)
+    if stats:
+        ctx.call_on_close(common.printHttpSummary)
+    if stats_json:
+        ctx.call_on_close(lambda: common.exportHttpRecords(stats_json))
+    if profile: # Imported on demand, profiling is never paid for otherwise
+        from functions import profiling
+        ctx.call_on_close(profiling.startProfiling(profile))
 
 
 if __name__ == "__main__":
-    main()
+    exit_code = serve.forwardCommand(sys.argv[1:]) # Answered by a running 'glabctl serve' when there is one
+    if exit_code is None:
+        main()
+    else:
+        sys.exit(exit_code)
@@ -0,0 +1,43 @@
+import os,sys
+import click,gitlab,pytest
+
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_directory)
+sys.path.insert(0, os.path.join(root_directory, 'benchmarks'))
+
+import mockserver
+
+
+@pytest.fixture(scope='session')
+def gitlab_server(): # Synthetic Gitlab of the benchmarks: project 50 is archived, 'main' is protected at level 40 everywhere
+    server = mockserver.startServer(mockserver.Instance(projects=60, users=10, groups=2, branches=3))
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def gl(gitlab_server): # Connection recording the method & path of every request it sends, in order
+    connection = gitlab.Gitlab('http://127.0.0.1:%d' % gitlab_server.server_address[1], private_token='test')
+    connection.sent_requests = []
+    connection.session.hooks['response'].append(lambda response, *args, **kwargs: connection.sent_requests.append(
+        (response.request.method, response.request.path_url.split('?')[0][len('/api/v4'):])))
+    return connection
+
+
+@pytest.fixture
+def glabctl(gitlab_server): # Runs a glabctl command line against the synthetic Gitlab, returning its click Result
+    import main
+    from click.testing import CliRunner
+    from functions import common
+
+    @click.command(context_settings={'ignore_unknown_options': True, 'allow_extra_args': True})
+    @click.pass_context
+    def flushedCommand(ctx): # Listings are written out when glabctl exits, flushed here while the runner still captures them
+        try:
+            main.main.main(ctx.args, prog_name='glabctl')
+        finally:
+            common.outputReset()
+
+    def run(*arguments, input=None):
+        return CliRunner().invoke(flushedCommand, ['--no-cache'] + list(arguments) + ['--url', 'http://127.0.0.1:%d' % gitlab_server.server_address[1], '--token', 'test'], input=input)
+    return run
@@ -0,0 +1,111 @@
+import json
+import mockserver,pytest
+from click.testing import CliRunner
+from functions import apply,update
+
+instance = mockserver.Instance(projects=60, users=10, groups=2, branches=3)
+protected_main = {'main': {'name': 'main', 'push_access_levels': [{'access_level': 40}], 'merge_access_levels': [{'access_level': 40}]}}
+
+
+def runWrites(gl, section, current_element, desired_element, changes):
+    for write in apply.planWrites(gl, section, current_element, desired_element, changes):
+        write()
+    return gl.sent_requests
+
+
+def test_diff_element_in_desired_state():
+    desired = {'project': 'group-1/project-1', 'description': 'Synthetic project 1', 'visibility': 'internal', 'archived': False}
+    assert apply.diffElement(instance.projectElement(1), desired, 'project') == {}
+
+
+def test_diff_element_changes():
+    desired = {'project': 'group-1/project-1', 'description': 'Payments API', 'visibility': 'internal'}
+    assert apply.diffElement(instance.projectElement(1), desired, 'project') == {'description': {'before': 'Synthetic project 1', 'after': 'Payments API'}}
+
+
+def test_diff_element_unknown_attribute():
+    with pytest.raises(KeyError):
+        apply.diffElement(instance.projectElement(1), {'project': 'group-1/project-1', 'descripton': 'typo'}, 'project')
+
+
+def test_no_changes_plan_no_writes(gl):
+    assert runWrites(gl, 'projects', instance.projectElement(1), {'project': 'group-1/project-1'}, {}) == []
+
+
+@pytest.mark.parametrize('project_id, archived, endpoint', [(1, True, '/projects/1/archive'), (50, False, '/projects/50/unarchive')])
+def test_archived_uses_its_own_endpoint(gl, project_id, archived, endpoint):
+    current = instance.projectElement(project_id)
+    changes = apply.diffElement(current, {'project': current['path_with_namespace'], 'archived': archived}, 'project')
+    assert runWrites(gl, 'projects', current, {'archived': archived}, changes) == [('POST', endpoint)]
+
+
+def test_archived_after_the_other_attributes(gl):
+    current = instance.projectElement(1)
+    changes = apply.diffElement(current, {'project': current['path_with_namespace'], 'archived': True, 'description': 'Old API'}, 'project')
+    assert runWrites(gl, 'projects', current, {}, changes) == [('PUT', '/projects/1'), ('POST', '/projects/1/archive')]
+
+
+def test_diff_branch_in_desired_state():
+    assert apply.diffBranch(protected_main, {'project': 'group-1/project-1', 'branch': 'main'}) == {}
+    assert apply.diffBranch(protected_main, {'project': 'group-1/project-1', 'branch': 'feature-1', 'protected': False}) == {}
+
+
+def test_protection_change_removes_then_protects_again(gl):
+    desired = {'project': 'group-1/project-1', 'branch': 'main', 'push_access_level': 30}
+    changes = apply.diffBranch(protected_main, desired)
+    assert changes == {'push_access_level': {'before': 40, 'after': 30}}
+    assert runWrites(gl, 'branches', protected_main, desired, changes) == [('DELETE', '/projects/group-1%2Fproject-1/protected_branches/main'),
+                                                                            ('POST', '/projects/group-1%2Fproject-1/protected_branches')]
+
+
+def test_new_protection_is_only_created(gl):
+    desired = {'project': 'group-1/project-1', 'branch': 'feature-1'}
+    changes = apply.diffBranch(protected_main, desired)
+    assert changes['protected'] == {'before': False, 'after': True}
+    assert runWrites(gl, 'branches', protected_main, desired, changes) == [('POST', '/projects/group-1%2Fproject-1/protected_branches')]
+
+
+def test_unprotect_is_only_removed(gl):
+    desired = {'project': 'group-1/project-1', 'branch': 'main', 'protected': False}
+    changes = apply.diffBranch(protected_main, desired)
+    assert runWrites(gl, 'branches', protected_main, desired, changes) == [('DELETE', '/projects/group-1%2Fproject-1/protected_branches/main')]
+
+
+def test_apply_in_desired_state_sends_no_writes(gitlab_server, tmp_path):
+    import main
+
+    state_file = tmp_path / 'state.json'
+    state_file.write_text(json.dumps({'projects': [{'project': 'group-1/project-1', 'archived': False}, {'project': 'group-2/project-50', 'archived': True}],
+                                      'groups': [{'group': 'group-1', 'request_access_enabled': False}],
+                                      'branches': [{'project': 'group-1/project-1', 'branch': 'main', 'push_access_level': 40}]}))
+    gitlab_server.statistics.reset()
+    result = CliRunner().invoke(main.main, ['--no-cache', 'apply', '-f', str(state_file), '--yes',
+                                            '--url', 'http://127.0.0.1:%d' % gitlab_server.server_address[1], '--token', 'test'])
+    assert result.exit_code == 0, result.output
+    assert '0 to change, 4 already in the desired state, 0 failed' in result.output
+    assert [gitlab_server.statistics.read()[method] for method in ('POST', 'PUT', 'DELETE')] == [0, 0, 0]
+
+
+def test_apply_reports_unknown_attributes(gitlab_server, tmp_path):
+    import main
+
+    state_file = tmp_path / 'state.json'
+    state_file.write_text(json.dumps({'projects': [{'project': 'group-1/project-1', 'descripton': 'typo'}]}))
+    result = CliRunner().invoke(main.main, ['--no-cache', 'apply', '-f', str(state_file), '--yes',
+                                            '--url', 'http://127.0.0.1:%d' % gitlab_server.server_address[1], '--token', 'test'])
+    assert result.exit_code == 1
+    assert "Unknown attribute 'descripton'" in result.output
+
+
+def test_protection_with_specific_users_is_not_recreated():
+    protected_branches = {'main': {'name': 'main', 'push_access_levels': [{'access_level': None, 'user_id': 5}, {'access_level': 40}],
+                                   'merge_access_levels': [{'access_level': 40}]}}
+    assert apply.diffBranch(protected_branches, {'project': 'group-1/project-1', 'branch': 'main'}) == {}
+    with pytest.raises(ValueError):
+        apply.diffBranch(protected_branches, {'project': 'group-1/project-1', 'branch': 'main', 'push_access_level': 30})
+    assert apply.diffBranch(protected_branches, {'project': 'group-1/project-1', 'branch': 'main', 'protected': False}) == {'protected': {'before': True, 'after': False}}
+
+
+def test_only_boolean_attributes_are_converted():
+    changes = {'description': {'before': 'API', 'after': 'True'}, 'wiki_enabled': {'before': True, 'after': 'False'}, 'archived': {'before': False, 'after': 'True'}}
+    assert update.changesPayload(changes, ('archived',)) == {'description': 'True', 'wiki_enabled': False}
@@ -0,0 +1,19 @@
+from click.testing import CliRunner
+
+
+def test_failed_operations_do_not_stop_the_batch(gitlab_server, tmp_path, monkeypatch):
+    import main
+
+    monkeypatch.setenv('GLABCTL_URL', 'http://127.0.0.1:%d' % gitlab_server.server_address[1])
+    monkeypatch.setenv('GLABCTL_TOKEN', 'test')
+    batch_file = tmp_path / 'operations.txt'
+    batch_file.write_text('create branch feature-x -p group-1/missing-project\n'
+                          'update project group-1/project-1 --description "Payments API"\n'
+                          'get project -p group-1/project-1 id\n')
+    result = CliRunner().invoke(main.main, ['--no-cache', 'batch', str(batch_file)], input='')
+
+    assert result.exit_code == 1, result.output
+    assert '[FAILED] #1 create branch feature-x -p group-1/missing-project: ' in result.output
+    assert '[FAILED] #2 update project group-1/project-1 --description \'Payments API\': A confirmation was asked but there is no input, use --yes/--auto-confirm' in result.output
+    assert '[OK] #3 get project -p group-1/project-1 id' in result.output
+    assert '[SUMMARY] 3 operations, 2 failed' in result.output
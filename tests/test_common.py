@@ -0,0 +1,31 @@
+import time
+import pytest,requests
+from functions import common
+
+
+def gitlabResponse(status_code, **headers):
+    response = requests.models.Response()
+    response.status_code = status_code
+    response.headers.update({name.replace('_', '-'): value for name, value in headers.items()})
+    return response
+
+
+@pytest.fixture(autouse=True)
+def rateLimitState(monkeypatch):
+    monkeypatch.setattr(common, 'rate_limit_state', {'remaining': None, 'reset': 0.0, 'pause_until': 0.0})
+
+
+def test_rate_limit_headers_are_read():
+    reset = time.time() + 30
+    common.recordRateLimit(gitlabResponse(200, RateLimit_Remaining='3', RateLimit_Reset=str(int(reset))))
+    assert common.rate_limit_state['remaining'] == 3 and common.rate_limit_state['reset'] == int(reset)
+
+
+@pytest.mark.parametrize('remaining, reset', [('', '1700000000'), ('3, 3', '1700000000'), ('3', 'soon')])
+def test_unreadable_rate_limit_headers_never_throttle(monkeypatch, remaining, reset):
+    common.recordRateLimit(gitlabResponse(200, RateLimit_Remaining='0'))
+    common.recordRateLimit(gitlabResponse(200, RateLimit_Remaining=remaining, RateLimit_Reset=reset))
+    assert common.rate_limit_state['remaining'] is None
+
+    monkeypatch.setattr(time, 'sleep', lambda delay: pytest.fail('Paused %.1fs on an unreadable quota' % delay))
+    common.waitForRateLimit()
@@ -0,0 +1,56 @@
+import json
+from functions import common
+
+
+def test_transform_to_dict_returns_a_copy(gl):
+    project = gl.projects.get(1)
+    for element in (project, {'id': 1, 'name': 'project-1'}):
+        copy = common.transformToDict(element)
+        copy['name'] = 'changed'
+        assert common.transformToDict(element)['name'] == 'project-1'
+    assert common.transformToDict(project, ['id', 'path', 'missing']) == {'id': 1, 'path': 'project-1'}
+
+
+def test_listings_keep_every_attribute(glabctl):
+    result = glabctl('get', 'projects', '-g', 'group-1', '--limit', '2', '-o', 'ndjson')
+    assert result.exit_code == 0, result.output
+    projects = [json.loads(line) for line in result.output.splitlines()]
+    assert [project['path_with_namespace'] for project in projects] == ['group-1/project-1', 'group-1/project-3']
+    assert projects[0]['archived'] is False and projects[0]['_links']['members'].endswith('/projects/1/members')
+
+
+def test_fields_projection(glabctl):
+    result = glabctl('get', 'projects', '-g', 'group-2', '--limit', '2', '--fields', 'id,path_with_namespace', '-o', 'csv')
+    assert result.output.splitlines() == ['id,path_with_namespace', '2,group-2/project-2', '4,group-2/project-4']
+
+    result = glabctl('get', 'projects', '-g', 'group-2', '--limit', '1', '--fields', 'id,archived', '-o', 'json') # Not in the simple representation
+    assert json.loads(result.output) == {'id': 2, 'archived': False}
+
+
+def test_parallel_pages_without_gitlab_totals(monkeypatch):
+    import gitlab,mockserver,threading
+    from functions import get
+
+    in_flight = {'now': 0, 'max': 0}
+    lock = threading.Lock()
+    requestGitlabList = get.requestGitlabList
+    def countedRequest(*args, **kwargs): # Pages requested at the same time, 1 when walked one by one
+        with lock:
+            in_flight['now'] += 1
+            in_flight['max'] = max(in_flight['max'], in_flight['now'])
+        try:
+            return requestGitlabList(*args, **kwargs)
+        finally:
+            with lock:
+                in_flight['now'] -= 1
+    monkeypatch.setattr(get, 'requestGitlabList', countedRequest)
+
+    server = mockserver.startServer(mockserver.Instance(projects=mockserver.total_headers_limit + 50, users=10, groups=2), latency_ms=20) # Too many for Gitlab to count
+    try:
+        big_gl = gitlab.Gitlab('http://127.0.0.1:%d' % server.server_address[1], private_token='test')
+        projects = list(get.listGitlabElements(big_gl.projects, 100, 0, parallel=4, simple=True))
+        assert [project['id'] for project in projects] == list(range(1, mockserver.total_headers_limit + 51))
+        assert in_flight['max'] > 1
+        assert server.statistics.read()['requests'] <= 101 + 4 * 2 # Past the last page, at most one window of empty pages
+    finally:
+        server.shutdown()
@@ -0,0 +1,21 @@
+import pytest
+from functions import cache,index
+
+
+@pytest.fixture(autouse=True)
+def indexDirectory(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'cache_directory', str(tmp_path))
+    monkeypatch.setattr(index, 'index_connections', {})
+
+
+def test_digits_are_a_name_unless_ids_are_accepted(gl):
+    assert index.lookupId(gl, 'user', '3') is None
+    assert index.lookupId(gl, 'user', '3', accepts_id=True) == 3
+    assert gl.sent_requests == [('GET', '/users')]
+
+
+def test_index_hits_are_checked(gl):
+    index.storeIds(gl, 'user', {'user-3': 4}) # user-4 took this entry's ID, as after a rename
+    assert index.lookupId(gl, 'user', 'user-3') == 3
+    assert index.cachedIds(gl, 'user', ['user-3']) == {'user-3': 3}
+    assert gl.sent_requests == [('GET', '/users/4'), ('GET', '/users')]
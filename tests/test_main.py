@@ -0,0 +1,11 @@
+import importlib
+import pytest
+from functions import commands
+
+
+@pytest.mark.parametrize('cmd_name', list(commands.subcommands))
+def test_help_listing_matches_the_loaded_command(cmd_name):
+    module_name, short_help = commands.subcommands[cmd_name]
+    command = getattr(importlib.import_module(module_name), cmd_name)
+    assert command.name == cmd_name
+    assert command.get_short_help_str(limit=200) == short_help
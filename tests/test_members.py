@@ -0,0 +1,33 @@
+import io
+import click,pytest
+from functions import members
+
+
+def membersFile(name, content):
+    members_file = io.StringIO(content)
+    members_file.name = name
+    return members_file
+
+
+def test_csv_with_header_comments_and_default_level():
+    content = 'username,access_level\n# Team leads\njdoe,maintainer\n\nasmith, 20\nbwayne\n'
+    assert members.readMembersFile(membersFile('members.csv', content)) == {'jdoe': 40, 'asmith': 20, 'bwayne': 30}
+
+
+def test_json_mapping_and_list():
+    assert members.readMembersFile(membersFile('members.json', '{"jdoe": "developer", "asmith": 50}')) == {'jdoe': 30, 'asmith': 50}
+    assert members.readMembersFile(membersFile('-', '[{"username": "jdoe", "access_level": "guest"}]')) == {'jdoe': 10}
+
+
+def test_yaml_mapping():
+    pytest.importorskip('yaml')
+    assert members.readMembersFile(membersFile('members.yml', 'jdoe: reporter\nasmith: 40\n')) == {'jdoe': 20, 'asmith': 40}
+
+
+def test_usernames_are_case_insensitive():
+    assert members.readMembersFile(membersFile('members.csv', 'JDoe,developer\n')) == {'jdoe': 30}
+
+
+def test_unknown_access_level():
+    with pytest.raises(click.ClickException, match='Unknown access level <admin>'):
+        members.readMembersFile(membersFile('members.csv', 'jdoe,admin\n'))
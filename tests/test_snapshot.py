@@ -0,0 +1,32 @@
+import click,pytest
+from functions import snapshot
+
+project = {'id': 7, 'name': 'payments-api', 'path': 'payments-api', 'path_with_namespace': 'backend/payments-api',
+           'visibility': 'private', 'archived': False, 'last_activity_at': '2026-03-01T00:00:00.000Z'}
+
+
+def test_no_filters():
+    assert snapshot.matchesFilters(project, {})
+
+
+@pytest.mark.parametrize('filters, matches', [({'search': 'PAYMENTS'}, True), ({'search': 'billing'}, False),
+                                              ({'group': 'backend'}, True), ({'group': 'backend/'}, True), ({'group': 'back'}, False),
+                                              ({'last_activity_after': '2026-02-01'}, True), ({'last_activity_after': '2026-04-01'}, False),
+                                              ({'visibility': 'private', 'archived': False}, True), ({'archived': True}, False)])
+def test_filters(filters, matches):
+    assert snapshot.matchesFilters(project, filters) == matches
+
+
+def test_group_filter_on_branches():
+    assert snapshot.matchesFilters({'name': 'main', 'project': 'backend/payments-api'}, {'group': 'backend'})
+
+
+def test_token_dependent_filters_are_refused():
+    with pytest.raises(click.ClickException, match='--owned'):
+        snapshot.matchesFilters(project, {'owned': True})
+
+
+def test_take_snapshot(gl, tmp_path):
+    connection = snapshot.openSnapshot(str(tmp_path / 'snapshot.sqlite'))
+    assert snapshot.takeSnapshot(gl, connection, True, 2) == {'projects': 60, 'groups': 2, 'users': 10, 'branches': 180}
+    assert connection.execute("SELECT name FROM branches WHERE project = 'group-2/project-60' ORDER BY name").fetchall() == [('feature-1',), ('feature-2',), ('main',)]
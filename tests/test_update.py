@@ -0,0 +1,16 @@
+import re
+import pytest
+from click.testing import CliRunner
+
+
+@pytest.mark.parametrize('project, archive, expected', [('group-1/project-1', 'True', ['PUT /api/v4/projects/1', 'POST /api/v4/projects/1/archive']),
+                                                        ('group-2/project-50', 'False', ['POST /api/v4/projects/50/unarchive', 'PUT /api/v4/projects/50'])])
+def test_project_is_never_edited_while_archived(gitlab_server, monkeypatch, project, archive, expected):
+    import main
+
+    monkeypatch.setenv('GLABCTL_URL', 'http://127.0.0.1:%d' % gitlab_server.server_address[1])
+    monkeypatch.setenv('GLABCTL_TOKEN', 'test')
+    result = CliRunner().invoke(main.main, ['--no-cache', '--trace', 'update', 'project', project, '--archive', archive, '--description', 'Payments API', '--yes'])
+
+    assert result.exit_code == 0, result.output
+    assert re.findall(r'\[TRACE\] ((?:PUT|POST) \S+)', result.output) == expected